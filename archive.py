@@ -0,0 +1,141 @@
+"""
+Arquivamento de mensagens antigas de chats ociosos em segmentos comprimidos (MessageArchive).
+
+Mensagens já lidas, enviadas há mais de N dias em chats sem atividade recente, saem da tabela
+Message e vão para segmentos por chat, com JSON comprimido via zlib. Assim a tabela quente e
+seus índices continuam pequenos. A leitura é transparente: get_messages combina os segmentos
+com as mensagens da tabela quente. Mensagens não lidas nunca são arquivadas, então contagens de
+não lidas e "marcar como lida" continuam operando só sobre a tabela Message.
+
+Para rodar:
+    python archive.py --days 90 --idle-days 30
+"""
+import argparse
+import json
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from models import db, Chat, Message, MessageArchive
+
+ARCHIVE_AFTER_DAYS = 90
+CHAT_IDLE_DAYS = 30
+SEGMENT_SIZE = 500
+
+# Mesmos atributos de Message usados por serialize_message
+ArchivedMessage = namedtuple('ArchivedMessage', ['id', 'sender_id', 'sender_type', 'content', 'sent_at', 'is_read'])
+
+def encode_segment(messages):
+    rows = [[m.id, m.sender_id, m.sender_type, m.content, m.sent_at.isoformat(), m.is_read] for m in messages]
+    return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+
+def decode_segment(payload):
+    rows = json.loads(zlib.decompress(payload).decode('utf-8'))
+    return [
+        ArchivedMessage(id, sender_id, sender_type, content, datetime.fromisoformat(sent_at), is_read)
+        for id, sender_id, sender_type, content, sent_at, is_read in rows
+    ]
+
+def read_archived(segments, before_id=None, limit=None):
+    """
+    Lê mensagens arquivadas, em ordem de id, a partir de segmentos ordenados por
+    last_message_id decrescente. Com `limit`, para de descomprimir quando nenhum segmento
+    restante pode conter mensagens entre as `limit` de maior id já lidas.
+    """
+    result = []
+    for segment in segments:
+        if before_id is not None and segment.first_message_id >= before_id:
+            continue
+        # Segmentos de execuções diferentes podem se sobrepor em ids (mensagens não lidas são
+        # arquivadas numa execução posterior), então ter `limit` mensagens não basta para parar
+        if limit is not None and len(result) >= limit and segment.last_message_id <= result[-limit].id:
+            break
+        result.extend(m for m in decode_segment(segment.payload) if before_id is None or m.id < before_id)
+        result.sort(key=lambda m: m.id)
+    return result
+
+def archive_floor(hot, limit):
+    """
+    Com `limit`, recebe a página da tabela quente em ordem crescente de id. Se ela já estiver
+    cheia, só segmentos com last_message_id acima do id retornado podem entrar; senão None.
+    """
+    if limit is not None and hot and len(hot) == limit:
+        return hot[0].id
+    return None
+
+def message_page(hot, segments, before_id=None, limit=None):
+    """Página de get_messages: mensagens da tabela quente combinadas com as arquivadas"""
+    archived = read_archived(segments, before_id, limit)
+    return merge_messages(hot, archived, limit) if archived else hot
+
+def latest_archived(segments):
+    """Mensagem arquivada mais recente (por sent_at) entre os segmentos informados"""
+    messages = [m for segment in segments for m in decode_segment(segment.payload)]
+    return max(messages, key=lambda m: m.sent_at) if messages else None
+
+def merge_messages(hot, archived, limit=None):
+    """
+    Combina mensagens da tabela quente com as arquivadas.
+    Sem `limit` mantém a ordenação por sent_at; com `limit` (paginação) retorna as
+    `limit` mais recentes por id, em ordem crescente.
+    """
+    if limit is not None:
+        return sorted(hot + archived, key=lambda m: m.id)[-limit:]
+    return sorted(archived + hot, key=lambda m: m.sent_at)
+
+def archive_messages(older_than_days=ARCHIVE_AFTER_DAYS, idle_days=CHAT_IDLE_DAYS, segment_size=SEGMENT_SIZE):
+    """Move mensagens antigas e lidas de chats ociosos para MessageArchive. Requer app context."""
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+    idle_cutoff = now - timedelta(days=idle_days)
+
+    chat_ids = [chat_id for (chat_id,) in db.session.query(Chat.id).filter(Chat.last_message_at < idle_cutoff)]
+
+    archived_chats = 0
+    archived_messages = 0
+    for chat_id in chat_ids:
+        messages = Message.query.filter(
+            Message.chat_id == chat_id,
+            Message.sent_at < cutoff,
+            Message.is_read == True
+        ).order_by(Message.id).all()
+
+        if not messages:
+            continue
+
+        for start in range(0, len(messages), segment_size):
+            chunk = messages[start:start + segment_size]
+            db.session.add(MessageArchive(
+                chat_id=chat_id,
+                first_message_id=chunk[0].id,
+                last_message_id=chunk[-1].id,
+                first_sent_at=min(m.sent_at for m in chunk),
+                last_sent_at=max(m.sent_at for m in chunk),
+                message_count=len(chunk),
+                payload=encode_segment(chunk)
+            ))
+
+        Message.query.filter(Message.id.in_([m.id for m in messages])).delete(synchronize_session=False)
+        # Um commit por chat mantém as transações (e o lock de escrita do SQLite) curtas
+        db.session.commit()
+
+        archived_chats += 1
+        archived_messages += len(messages)
+
+    return archived_chats, archived_messages
+
+def main():
+    parser = argparse.ArgumentParser(description="Arquiva mensagens antigas de chats ociosos.")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="idade mínima das mensagens (dias)")
+    parser.add_argument("--idle-days", type=int, default=CHAT_IDLE_DAYS, help="dias sem mensagens para o chat ser considerado ocioso")
+    parser.add_argument("--segment-size", type=int, default=SEGMENT_SIZE, help="mensagens por segmento")
+    args = parser.parse_args()
+
+    from app import create_db_app
+
+    with create_db_app().app_context():
+        chats, messages = archive_messages(args.days, args.idle_days, args.segment_size)
+
+    print(f"✅ {messages} mensagens arquivadas em {chats} chats")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""
+Servidor assíncrono (Quart + SQLAlchemy asyncio) para os endpoints de busca, chat e métricas.
+
+Cada requisição é uma corrotina, e não uma thread: conexões de long-poll ociosas custam
+apenas alguns KB de memória, então um único processo segura milhares de chats abertos.
+As respostas são idênticas às de app.py (mesmos serializadores em helpers.py).
+
+Para rodar:
+    hypercorn async_app:app --bind 0.0.0.0:5001
+"""
+import asyncio
+import os
+from datetime import datetime
+from quart import Quart, request, jsonify
+from quart_cors import cors
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import selectinload
+from models import Professional, Subscription, Schedule, Chat, Message, MessageArchive, ProfessionalMetrics
+from cache import professional_cache
+from ratelimit import DEFAULTS as WRITE_LIMIT_DEFAULTS, AsyncWriteQueue, write_limiter, async_write_limited
+from archive import archive_floor, message_page, latest_archived
+from helpers import (
+    VALID_METRICS, batch_ids, cached_profiles, cache_profiles, batch_result, chat_upsert, message_insert,
+    idempotency_key, page_limit, poll_wait, rank_search_results, serialize_search_result, serialize_chat,
+    serialize_message, conversion_rate, serialize_metrics, serialize_dashboard
+)
+
+# Mensagens gravadas por outro processo (ex.: app.py) não acordam os long-polls deste;
+# elas são percebidas por uma releitura do banco neste intervalo
+LONG_POLL_FALLBACK_INTERVAL = 5.0
+
+app = Quart(__name__)
+app = cors(app)
+
+# Mesmo arquivo SQLite usado pelo app.py (Flask-SQLAlchemy resolve caminhos relativos na pasta instance/)
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///" + os.path.join(app.instance_path, "match_trampo.db")
+engine = create_async_engine(os.environ.get("ASYNC_DATABASE_URL", DEFAULT_DATABASE_URL))
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+# Rate limit e fila de escrita (ver ratelimit.py): mesmas chaves de configuração do app.py,
+# lidas de variáveis de ambiente
+for _name, _default in WRITE_LIMIT_DEFAULTS.items():
+    app.config.setdefault(_name, type(_default)(os.environ.get(_name, _default)))
+write_limiter.init_app(app, AsyncWriteQueue)
+
+@app.route("/api/search/professionals", methods=["GET"])
+async def search_professionals():
+    profession_query = request.args.get("profession")
+    city_query = request.args.get("city")
+    state_query = request.args.get("state")
+    user_latitude = request.args.get("latitude", type=float)
+    user_longitude = request.args.get("longitude", type=float)
+
+    if not profession_query:
+        return jsonify({"status": "error", "message": "O parâmetro 'profession' é obrigatório."}), 400
+
+    query = select(Professional, Subscription.plan).join(Subscription, Professional.id == Subscription.professional_id)
+    query = query.where(Professional.profession.ilike(f"%{profession_query}%"))
+
+    if city_query:
+        query = query.where(Professional.city.ilike(f"%{city_query}%"))
+    if state_query:
+        query = query.where(Professional.state.ilike(f"%{state_query}%"))
+
+    if user_latitude is not None and user_longitude is not None:
+        query = query.where(Professional.latitude.isnot(None), Professional.longitude.isnot(None))
+
+    async with Session() as session:
+        professionals_with_subscription = (await session.execute(query)).all()
+
+    results = [serialize_search_result(professional, plan) for professional, plan in professionals_with_subscription]
+    rank_search_results(results, user_latitude, user_longitude)
+
+    return jsonify({"status": "success", "results": results})
+
+@app.route("/api/status", methods=["GET"])
+async def status():
+    return jsonify({"status": "ok", "service": "Match Trampo Backend API"})
+
+@app.route("/api/status/writes", methods=["GET"])
+async def write_status():
+    """Contadores do rate limit e da fila de escrita"""
+    return jsonify({"status": "success", "writes": app.extensions["write_limiter"]["stats"].snapshot()})
+
+# ==================== ENDPOINTS DE CHAT ====================
+
+@app.route("/api/chats", methods=["GET"])
+async def get_chats():
+    """Retorna todos os chats de um usuário (cliente ou profissional)"""
+    user_id = request.args.get("user_id")
+    user_type = request.args.get("user_type")  # 'client' ou 'professional'
+
+    if not user_id or not user_type:
+        return jsonify({"status": "error", "message": "user_id e user_type são obrigatórios."}), 400
+
+    if user_type == "client":
+        query = select(Chat).where(Chat.client_id == user_id)
+    elif user_type == "professional":
+        query = select(Chat).where(Chat.professional_id == user_id)
+    else:
+        return jsonify({"status": "error", "message": "user_type deve ser 'client' ou 'professional'."}), 400
+
+    query = query.options(selectinload(Chat.professional)).order_by(Chat.last_message_at.desc())
+
+    async with Session() as session:
+        chats = (await session.scalars(query)).all()
+
+        result = []
+        for chat in chats:
+            last_message = await session.scalar(
+                select(Message).where(Message.chat_id == chat.id).order_by(Message.sent_at.desc()).limit(1)
+            )
+            unread_count = await session.scalar(
+                select(func.count(Message.id)).where(
+                    Message.chat_id == chat.id, Message.is_read == False, Message.sender_id != user_id
+                )
+            )
+            # Mensagens lidas podem ter sido arquivadas: só descomprime se houver segmento mais novo
+            newer_segments = (await session.scalars(
+                select(MessageArchive).where(
+                    MessageArchive.chat_id == chat.id,
+                    MessageArchive.last_sent_at > (last_message.sent_at if last_message else datetime.min)
+                ).order_by(MessageArchive.last_sent_at.desc()).limit(1)
+            )).all()
+            last_message = latest_archived(newer_segments) or last_message
+            result.append(serialize_chat(chat, chat.professional, last_message, unread_count))
+
+    return jsonify({"status": "success", "chats": result})
+
+@app.route("/api/chats/<int:chat_id>/messages", methods=["GET"])
+async def get_messages(chat_id):
+    """
+    Retorna as mensagens de um chat específico, incluindo as arquivadas.
+    Paginação opcional: `limit` mensagens mais recentes com id menor que `before_id`.
+    """
+    before_id = request.args.get("before_id", type=int)
+    try:
+        limit = page_limit(request.args.get("limit"))
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+
+    async with Session() as session:
+        chat = await session.get(Chat, chat_id)
+
+        if not chat:
+            return jsonify({"status": "error", "message": "Chat não encontrado."}), 404
+
+        query = select(Message).where(Message.chat_id == chat_id)
+        if before_id is not None:
+            query = query.where(Message.id < before_id)
+        if limit is not None:
+            query = query.order_by(Message.id.desc()).limit(limit)
+        else:
+            query = query.order_by(Message.sent_at)
+        messages = list((await session.scalars(query)).all())
+
+        if limit is not None:
+            messages.reverse()
+
+        segments_query = select(MessageArchive).where(MessageArchive.chat_id == chat_id)
+        floor = archive_floor(messages, limit)
+        if floor is not None:
+            segments_query = segments_query.where(MessageArchive.last_message_id > floor)
+        segments = (await session.scalars(segments_query.order_by(MessageArchive.last_message_id.desc()))).all()
+
+    messages = message_page(messages, segments, before_id, limit)
+
+    return jsonify({"status": "success", "messages": [serialize_message(msg) for msg in messages]})
+
+class NewMessageNotifier:
+    """Acorda os long-polls de um chat quando send_message grava uma mensagem nele"""
+
+    def __init__(self):
+        self._events = {}    # chat_id -> asyncio.Event compartilhado pelos long-polls do chat
+        self._waiting = {}   # chat_id -> long-polls inscritos
+
+    def subscribe(self, chat_id):
+        """Inscreve um long-poll antes da leitura do banco, para não perder um envio no meio"""
+        event = self._events.get(chat_id)
+        if event is None or event.is_set():
+            event = self._events[chat_id] = asyncio.Event()
+        self._waiting[chat_id] = self._waiting.get(chat_id, 0) + 1
+        return event
+
+    def unsubscribe(self, chat_id):
+        self._waiting[chat_id] -= 1
+        if not self._waiting[chat_id]:
+            del self._waiting[chat_id]
+            self._events.pop(chat_id, None)
+
+    def notify(self, chat_id):
+        event = self._events.pop(chat_id, None)
+        if event is not None:
+            event.set()
+
+new_message_notifier = NewMessageNotifier()
+
+async def _messages_after(session, chat_id, after_id):
+    """Mensagens do chat com id maior que `after_id`, ou None se o chat não existir (uma consulta só)"""
+    rows = (await session.execute(
+        select(Chat.id, Message)
+        .outerjoin(Message, (Message.chat_id == Chat.id) & (Message.id > after_id))
+        .where(Chat.id == chat_id)
+        .order_by(Message.sent_at)
+    )).all()
+    if not rows:
+        return None
+    return [message for _, message in rows if message is not None]
+
+@app.route("/api/chats/<int:chat_id>/messages/poll", methods=["GET"])
+async def poll_messages(chat_id):
+    """Long-poll: aguarda até `wait` segundos por mensagens com id maior que `after_id`"""
+    after_id = request.args.get("after_id", default=0, type=int)
+    try:
+        wait = poll_wait(request.args.get("wait"))
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    event = new_message_notifier.subscribe(chat_id)
+    try:
+        async with Session() as session:
+            messages = await _messages_after(session, chat_id, after_id)
+        if messages is None:
+            return jsonify({"status": "error", "message": "Chat não encontrado."}), 404
+
+        # Enquanto espera, o long-poll não segura conexão do pool nem consulta o banco
+        while not messages:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, LONG_POLL_FALLBACK_INTERVAL))
+            except asyncio.TimeoutError:
+                if loop.time() >= deadline:
+                    # O cliente refaz o long-poll, e a primeira leitura dele cobre o que faltou
+                    break
+            if event.is_set():
+                new_message_notifier.unsubscribe(chat_id)
+                event = new_message_notifier.subscribe(chat_id)
+            async with Session() as session:
+                messages = await _messages_after(session, chat_id, after_id)
+    finally:
+        new_message_notifier.unsubscribe(chat_id)
+
+    return jsonify({"status": "success", "messages": [serialize_message(msg) for msg in messages]})
+
+@app.route("/api/chats", methods=["POST"])
+@async_write_limited(body="client_id")
+async def create_or_get_chat():
+    """Cria um novo chat ou retorna um existente entre cliente e profissional"""
+    data = await request.get_json()
+    client_id = data.get("client_id")
+    professional_id = data.get("professional_id")
+    client_latitude = data.get("client_latitude")
+    client_longitude = data.get("client_longitude")
+    client_address = data.get("client_address")
+
+    if not client_id or not professional_id:
+        return jsonify({"status": "error", "message": "client_id e professional_id são obrigatórios."}), 400
+
+    # Um único INSERT ... ON CONFLICT: sem SELECT prévio e sem chats duplicados em toques simultâneos
+    now = datetime.utcnow()
+    async with Session() as session:
+        chat_id, created_at = (await session.execute(chat_upsert(
+            engine.dialect.name, client_id, professional_id, now,
+            client_latitude, client_longitude, client_address
+        ))).one()
+        await session.commit()
+
+    if created_at != now:
+        return jsonify({"status": "success", "chat_id": chat_id, "created": False})
+
+    return jsonify({"status": "success", "chat_id": chat_id, "created": True}), 201
+
+@app.route("/api/chats/<int:chat_id>/messages", methods=["POST"])
+@async_write_limited(body="sender_id")
+async def send_message(chat_id):
+    """Envia uma nova mensagem em um chat"""
+    async with Session() as session:
+        chat = await session.get(Chat, chat_id)
+
+        if not chat:
+            return jsonify({"status": "error", "message": "Chat não encontrado."}), 404
+
+        data = await request.get_json()
+        sender_id = data.get("sender_id")
+        sender_type = data.get("sender_type")  # 'client' ou 'professional'
+        content = data.get("content")
+
+        if not sender_id or not sender_type or not content:
+            return jsonify({"status": "error", "message": "sender_id, sender_type e content são obrigatórios."}), 400
+
+        if sender_type not in ["client", "professional"]:
+            return jsonify({"status": "error", "message": "sender_type deve ser 'client' ou 'professional'."}), 400
+
+        # Reenvios (rede móvel instável) com a mesma chave retornam a mensagem original
+        try:
+            key = idempotency_key(data.get("idempotency_key"), request.headers.get("Idempotency-Key"))
+        except ValueError as error:
+            return jsonify({"status": "error", "message": str(error)}), 400
+
+        now = datetime.utcnow()
+        new_message = (await session.execute(message_insert(
+            engine.dialect.name, chat_id, sender_id, sender_type, content, now, key
+        ))).one()
+        created = new_message.sent_at == now
+
+        if created:
+            # Atualiza o timestamp do último mensagem no chat
+            chat.last_message_at = now
+
+        await session.commit()
+
+    if created:
+        new_message_notifier.notify(chat_id)
+
+    return jsonify({"status": "success", "message": serialize_message(new_message)}), 201 if created else 200
+
+@app.route("/api/chats/<int:chat_id>/messages/<int:message_id>/read", methods=["PUT"])
+async def mark_message_as_read(chat_id, message_id):
+    """Marca uma mensagem como lida"""
+    async with Session() as session:
+        message = await session.scalar(
+            select(Message).where(Message.id == message_id, Message.chat_id == chat_id).limit(1)
+        )
+
+        if not message:
+            return jsonify({"status": "error", "message": "Mensagem não encontrada."}), 404
+
+        message.is_read = True
+        await session.commit()
+
+    return jsonify({"status": "success", "message": "Mensagem marcada como lida."})
+
+@app.route("/api/chats/<int:chat_id>/messages/read-all", methods=["PUT"])
+async def mark_all_messages_as_read(chat_id):
+    """Marca todas as mensagens de um chat como lidas para um usuário específico"""
+    data = await request.get_json()
+    user_id = data.get("user_id")
+
+    if not user_id:
+        return jsonify({"status": "error", "message": "user_id é obrigatório."}), 400
+
+    async with Session() as session:
+        chat = await session.get(Chat, chat_id)
+        if not chat:
+            return jsonify({"status": "error", "message": "Chat não encontrado."}), 404
+
+        # Marca como lidas todas as mensagens que não foram enviadas pelo usuário
+        messages = (await session.scalars(
+            select(Message).where(Message.chat_id == chat_id, Message.sender_id != user_id, Message.is_read == False)
+        )).all()
+
+        for msg in messages:
+            msg.is_read = True
+
+        await session.commit()
+
+    return jsonify({"status": "success", "message": f"{len(messages)} mensagens marcadas como lidas."})
+
+# ==================== FIM DOS ENDPOINTS DE CHAT ====================
+
+# ==================== ENDPOINTS DO DASHBOARD ====================
+
+@app.route("/api/professionals:batch", methods=["GET", "POST"])
+async def get_professionals_batch():
+    """
+    Retorna perfil, plano e métricas de vários profissionais em uma única chamada.
+    GET: ?ids=prof_123,prof_789   POST: {"ids": ["prof_123", "prof_789"]}
+    """
+    try:
+        ids = batch_ids(request.method, await request.get_json(silent=True), request.args.get("ids"))
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+
+    # Perfis recentes saem do cache; os demais são lidos com um IN (...) por tabela
+    profiles, missing = cached_profiles(ids)
+
+    if missing:
+        async with Session() as session:
+            professionals = (await session.scalars(select(Professional).where(Professional.id.in_(missing)))).all()
+            subscriptions = {s.professional_id: s for s in await session.scalars(
+                select(Subscription).where(Subscription.professional_id.in_(missing))
+            )}
+            metrics = {m.professional_id: m for m in await session.scalars(
+                select(ProfessionalMetrics).where(ProfessionalMetrics.professional_id.in_(missing))
+            )}
+        cache_profiles(profiles, professionals, subscriptions, metrics)
+
+    return jsonify(batch_result(ids, profiles))
+
+async def _get_or_create_metrics(session, professional_id):
+    metrics = await session.scalar(
+        select(ProfessionalMetrics).where(ProfessionalMetrics.professional_id == professional_id).limit(1)
+    )
+    if not metrics:
+        metrics = ProfessionalMetrics(professional_id=professional_id)
+        session.add(metrics)
+        await session.commit()
+        await session.refresh(metrics)
+        # O perfil em cache em /api/professionals:batch ainda traz "metrics": null
+        professional_cache.invalidate(professional_id)
+    return metrics
+
+@app.route("/api/professionals/<string:professional_id>/metrics", methods=["GET"])
+async def get_professional_metrics(professional_id):
+    """Retorna as métricas de desempenho de um profissional"""
+    async with Session() as session:
+        professional = await session.get(Professional, professional_id)
+
+        if not professional:
+            return jsonify({"status": "error", "message": "Profissional não encontrado."}), 404
+
+        metrics = await _get_or_create_metrics(session, professional_id)
+
+    # Calcular taxa de conversão
+    if metrics.profile_views > 0:
+        metrics.conversion_rate = conversion_rate(metrics)
+
+    metrics_data = serialize_metrics(metrics, metrics.conversion_rate)
+    metrics_data["last_updated"] = metrics.last_updated.isoformat()
+
+    return jsonify({"status": "success", "metrics": metrics_data})
+
+@app.route("/api/professionals/<string:professional_id>/dashboard", methods=["GET"])
+async def get_professional_dashboard(professional_id):
+    """Retorna dados completos do dashboard do profissional"""
+    async with Session() as session:
+        professional = await session.get(Professional, professional_id)
+
+        if not professional:
+            return jsonify({"status": "error", "message": "Profissional não encontrado."}), 404
+
+        metrics = await _get_or_create_metrics(session, professional_id)
+
+        subscription = await session.scalar(
+            select(Subscription).where(Subscription.professional_id == professional_id).limit(1)
+        )
+
+        active_chats = await session.scalar(
+            select(func.count(Chat.id)).where(Chat.professional_id == professional_id)
+        )
+
+        upcoming_schedules = (await session.scalars(
+            select(Schedule).where(
+                Schedule.professional_id == professional_id,
+                Schedule.start_time > datetime.utcnow(),
+                Schedule.status == 'BLOCKED'
+            ).order_by(Schedule.start_time).limit(5)
+        )).all()
+
+    return jsonify({
+        "status": "success",
+        "dashboard": serialize_dashboard(professional, subscription, metrics, active_chats, upcoming_schedules)
+    })
+
+@app.route("/api/professionals/<string:professional_id>/metrics/increment", methods=["POST"])
+@async_write_limited(path="professional_id")
+async def increment_metric(professional_id):
+    """Incrementa uma métrica específica do profissional"""
+    data = await request.get_json()
+    metric_name = data.get("metric")
+
+    if not metric_name:
+        return jsonify({"status": "error", "message": "O campo 'metric' é obrigatório."}), 400
+
+    if metric_name not in VALID_METRICS:
+        return jsonify({"status": "error", "message": f"Métrica '{metric_name}' inválida."}), 400
+
+    async with Session() as session:
+        metrics = await _get_or_create_metrics(session, professional_id)
+
+        current_value = getattr(metrics, metric_name)
+        setattr(metrics, metric_name, current_value + 1)
+
+        await session.commit()
+    professional_cache.invalidate(professional_id)
+
+    return jsonify({"status": "success", "message": f"Métrica '{metric_name}' incrementada com sucesso."})
+
+# ==================== FIM DOS ENDPOINTS DO DASHBOARD ====================
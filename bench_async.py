@@ -0,0 +1,165 @@
+"""
+Benchmark de concorrência: servidor síncrono (app.py, Flask) x assíncrono (async_app.py, Quart).
+
+Sobe os dois servidores de verdade, cada um em seu processo e sobre o mesmo banco temporário:
+  - síncrono: servidor WSGI com pool fixo de threads (como `gunicorn --threads N`), onde cada
+    long-poll ocupa uma thread;
+  - assíncrono: hypercorn, onde cada long-poll é uma corrotina.
+
+Em cada um, abre N conexões HTTP de long-poll ociosas (nenhuma mensagem chega) e mede:
+  - o tempo total até todos os long-polls retornarem e o mais lento deles;
+  - a latência de uma busca disparada enquanto os long-polls estão abertos.
+
+Uso:
+    python bench_async.py [--clients 1000] [--threads 32] [--wait 2.0]
+"""
+import argparse
+import asyncio
+import atexit
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SEARCH_URL = "/api/search/professionals?profession=Eletricista&latitude=-23.55&longitude=-46.63"
+SERVER_START_TIMEOUT = 15
+
+def serve_sync(port, threads, backlog):
+    """Roda app.py em um servidor WSGI com `threads` threads (modo --serve-sync)"""
+    from werkzeug.serving import BaseWSGIServer
+    from app import create_app
+
+    class PooledWSGIServer(BaseWSGIServer):
+        multithread = True
+        request_queue_size = backlog
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    PooledWSGIServer("127.0.0.1", port, create_app()).serve_forever()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def http_get(port, path):
+    """GET mínimo em HTTP/1.1 sobre uma conexão nova; retorna o status"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+def start_server(command, port, env):
+    process = subprocess.Popen(
+        command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            if asyncio.run(http_get(port, "/api/status")) == 200:
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Servidor não respondeu em {SERVER_START_TIMEOUT}s: {' '.join(command)}")
+
+async def run_load(port, chat_id, clients, wait):
+    poll_url = f"/api/chats/{chat_id}/messages/poll?after_id=0&wait={wait}"
+
+    async def poll():
+        started = time.perf_counter()
+        status = await http_get(port, poll_url)
+        return status, time.perf_counter() - started
+
+    started = time.perf_counter()
+    polls = [asyncio.create_task(poll()) for _ in range(clients)]
+    await asyncio.sleep(min(wait / 4, 0.5))  # garante que os long-polls já estão abertos
+    search_started = time.perf_counter()
+    search_status = await http_get(port, SEARCH_URL)
+    search_latency = time.perf_counter() - search_started
+    results = await asyncio.gather(*polls)
+    elapsed = time.perf_counter() - started
+
+    assert search_status == 200, search_status
+    assert all(status == 200 for status, _ in results), [status for status, _ in results]
+    return elapsed, max(duration for _, duration in results), search_latency
+
+def setup_database(db_path):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from app import create_db_app, init_db
+    from models import db, Chat
+
+    app = create_db_app()
+    init_db(app, reset=True)
+    with app.app_context():
+        chat = Chat(client_id="bench_client", professional_id="prof_123")
+        db.session.add(chat)
+        db.session.commit()
+        return chat.id
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000, help="long-polls simultâneos")
+    parser.add_argument("--threads", type=int, default=32, help="threads do servidor síncrono")
+    parser.add_argument("--wait", type=float, default=2.0, help="duração de cada long-poll (s)")
+    parser.add_argument("--serve-sync", type=int, metavar="PORTA", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    backlog = args.clients + 16
+
+    if args.serve_sync:
+        serve_sync(args.serve_sync, args.threads, backlog)
+        return
+
+    tmp_dir = tempfile.mkdtemp(prefix="match_trampo_bench_")
+    atexit.register(shutil.rmtree, tmp_dir, ignore_errors=True)
+    db_path = os.path.join(tmp_dir, "bench.db")
+    chat_id = setup_database(db_path)
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", ASYNC_DATABASE_URL=f"sqlite+aiosqlite:///{db_path}")
+    servers = [
+        (f"síncrono ({args.threads} threads)", lambda port: [
+            sys.executable, os.path.abspath(__file__), "--serve-sync", str(port),
+            "--threads", str(args.threads), "--clients", str(args.clients)
+        ]),
+        ("assíncrono (hypercorn)", lambda port: [
+            sys.executable, "-m", "hypercorn", "async_app:app",
+            "--bind", f"127.0.0.1:{port}", "--backlog", str(backlog)
+        ]),
+    ]
+
+    print(f"{args.clients} long-polls ociosos de {args.wait:.1f}s sobre HTTP")
+    print(f"{'servidor':<28}{'tempo total (s)':>18}{'poll mais lento (s)':>22}{'latência busca (ms)':>22}")
+    for name, command in servers:
+        port = free_port()
+        process = start_server(command(port), port, env)
+        try:
+            elapsed, slowest, search = asyncio.run(run_load(port, chat_id, args.clients, args.wait))
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{name:<28}{elapsed:>18.2f}{slowest:>22.2f}{search * 1000:>22.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark de memória da exportação em streaming (export.py).
+
+Popula um banco temporário com N mensagens, exporta tudo em NDJSON ou CSV descartando a saída
+e imprime o pico de memória (RSS) do processo a cada 10% das linhas. Com memória constante,
+o pico para de crescer logo nos primeiros blocos.
+
+Uso:
+    python bench_export.py --rows 10000000 --format csv
+"""
+import argparse
+import atexit
+import os
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp_dir = tempfile.mkdtemp(prefix="match_trampo_bench_")
+_db_path = os.path.join(_tmp_dir, "bench.db")
+atexit.register(shutil.rmtree, _tmp_dir, ignore_errors=True)  # 10M linhas ocupam ~1 GB
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+
+from app import create_db_app, init_db  # noqa: E402
+from models import db  # noqa: E402
+from export import export_chunks, CHUNK_ROWS  # noqa: E402
+
+INSERT_BATCH = 50000
+
+def peak_rss_mb():
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def populate(rows):
+    start = datetime(2025, 1, 1)
+    connection = sqlite3.connect(_db_path)
+    connection.execute("INSERT INTO chat (client_id, professional_id, created_at, last_message_at) VALUES ('bench_client', 'prof_123', ?, ?)", (start, start))
+    chat_id = connection.execute("SELECT last_insert_rowid()").fetchone()[0]
+    for offset in range(0, rows, INSERT_BATCH):
+        connection.executemany(
+            "INSERT INTO message (chat_id, sender_id, sender_type, content, sent_at, is_read) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (chat_id, "bench_client", "client", f"Mensagem de teste número {i}", (start + timedelta(seconds=i)).isoformat(" "), i % 2 == 0)
+                for i in range(offset, min(offset + INSERT_BATCH, rows))
+            )
+        )
+        connection.commit()
+    connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000, help="mensagens a exportar")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    args = parser.parse_args()
+
+    app = create_db_app()
+    init_db(app, reset=True)
+
+    started = time.perf_counter()
+    populate(args.rows)
+    print(f"{args.rows} mensagens inseridas em {time.perf_counter() - started:.1f}s")
+    print(f"RSS antes da exportação: {peak_rss_mb():.1f} MB")
+
+    checkpoint = max(args.rows // 10, 1)
+    exported = 0
+    next_checkpoint = checkpoint
+    output_bytes = 0
+
+    started = time.perf_counter()
+    with app.app_context():
+        for chunk in export_chunks(db.session, "messages", args.format):
+            output_bytes += len(chunk)
+            exported += CHUNK_ROWS
+            if exported >= next_checkpoint:
+                print(f"  {min(exported, args.rows):>10} linhas  pico RSS {peak_rss_mb():7.1f} MB")
+                next_checkpoint += checkpoint
+    elapsed = time.perf_counter() - started
+
+    print(f"Exportação {args.format}: {output_bytes / 1e6:.0f} MB em {elapsed:.1f}s ({args.rows / elapsed:,.0f} linhas/s)")
+    print(f"Pico de RSS final: {peak_rss_mb():.1f} MB")
+
+if __name__ == "__main__":
+    main()
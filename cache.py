@@ -0,0 +1,51 @@
+"""
+Cache em memória (identity map por id) para perfis de profissionais servidos em lote.
+Cada processo tem o seu; escritas conhecidas invalidam a entrada e o TTL cobre o restante.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """Cache LRU com expiração por entrada, seguro para uso entre threads"""
+
+    def __init__(self, max_size=5000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """Retorna {chave: valor} apenas para as chaves presentes e ainda válidas"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Perfis completos (perfil + assinatura + métricas) servidos por /api/professionals:batch
+professional_cache = TTLCache()
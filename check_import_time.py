@@ -0,0 +1,65 @@
+"""
+Verifica o orçamento de cold start do backend.
+
+Cada trecho roda em um interpretador novo, que mede o próprio tempo de parede com
+time.perf_counter (importações e chamadas, sem a inicialização do Python). Os módulos
+carregados vêm de `python -X importtime`. Sai com código 1 se algum orçamento for estourado,
+para ser usado no CI; tests/test_import_time.py roda as mesmas verificações no pytest.
+
+Uso:
+    python check_import_time.py
+"""
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ("flask", "flask_cors", "flask_sqlalchemy", "sqlalchemy", "werkzeug")
+# Só o app completo precisa destes; seeds e CLIs usam create_db_app()
+APP_ONLY_MODULES = ("flask_cors", "routes", "ratelimit", "dispatch", "cache", "helpers", "export")
+
+# (código executado, orçamento em ms, módulos que não podem ser importados)
+BUDGETS = [
+    ("import app", 50, HEAVY_MODULES),
+    ("import app; app.create_db_app()", 1000, APP_ONLY_MODULES),
+    ("import app; app.create_app()", 1500, ()),
+]
+
+TIMED = "import time as _time; _started = _time.perf_counter(); {code}; print((_time.perf_counter() - _started) * 1000)"
+
+def measure(code):
+    """Retorna o tempo de parede (ms) de `code` e os módulos importados"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", TIMED.format(code=code)],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        modules.add(line.rsplit("|", 1)[1].strip())
+    return float(result.stdout.split()[-1]), modules
+
+def check(code, forbidden, baseline_modules=frozenset()):
+    """Retorna o tempo (ms) de `code` e os módulos proibidos que ele importou"""
+    elapsed_ms, modules = measure(code)
+    loaded = sorted(m for m in modules - baseline_modules if m.split(".")[0] in forbidden)
+    return elapsed_ms, loaded
+
+def main():
+    _, baseline_modules = measure("pass")
+    failed = False
+
+    for code, budget_ms, forbidden in BUDGETS:
+        elapsed_ms, loaded = check(code, forbidden, baseline_modules)
+
+        ok = elapsed_ms <= budget_ms and not loaded
+        failed = failed or not ok
+        print(f"{'OK ' if ok else 'ERRO'} {code!r}: {elapsed_ms:.1f} ms (orçamento {budget_ms} ms)")
+        if loaded:
+            print(f"     módulos pesados importados: {', '.join(loaded)}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
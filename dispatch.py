@@ -0,0 +1,234 @@
+"""
+Despacho por localização (RF 2.10): profissionais mais próximos do endereço do cliente,
+com assinatura ativa e sem bloqueio de agenda no horário pedido.
+
+Os candidatos ficam pré-computados em memória, agrupados por profissão e célula de uma grade
+geográfica. Uma consulta percorre os anéis de células ao redor do cliente e para assim que os k
+mais próximos não podem mais ser superados, então o custo depende de k e não do total de
+profissionais. Commits que tocam Professional, Subscription ou Schedule marcam os profissionais
+afetados como sujos; só eles são recarregados na próxima consulta. Uma reconstrução completa
+periódica, feita em segundo plano e trocada pelo índice atual ao terminar, cobre escritas
+feitas por outros processos.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from math import floor, cos, radians
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Professional, Subscription, Schedule
+from helpers import haversine
+
+CELL_SIZE_DEGREES = 0.25  # ~28 km de lado no equador
+KM_PER_DEGREE = 111.19
+BLOCK_DURATION = timedelta(hours=2)  # Mesmo bloqueio do agendamento (RF 2.5)
+FULL_REFRESH_SECONDS = 300
+
+logger = logging.getLogger(__name__)
+
+def _cell(latitude, longitude):
+    return floor(latitude / CELL_SIZE_DEGREES), floor(longitude / CELL_SIZE_DEGREES)
+
+def _ring(row, col, radius):
+    """Células na borda do quadrado de raio `radius` (distância de Chebyshev) em torno de (row, col)"""
+    if radius == 0:
+        yield row, col
+        return
+    for c in range(col - radius, col + radius + 1):
+        yield row - radius, c
+        yield row + radius, c
+    for r in range(row - radius + 1, row + radius):
+        yield r, col - radius
+        yield r, col + radius
+
+def _profession_key(profession):
+    return profession.strip().lower()
+
+class DispatchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()   # uma reconstrução completa por vez
+        self._locations = {}                # professional_id -> (profissão, célula)
+        self._cells = defaultdict(dict)     # (profissão, célula) -> {professional_id: dados}
+        self._bounds = {}                   # profissão -> (min_row, max_row, min_col, max_col)
+        self._blocks = defaultdict(list)    # professional_id -> [(start_time, end_time)]
+        self._dirty = set()
+        self._building = None               # sujos durante uma reconstrução em andamento
+        self._built_at = None
+
+    def mark_dirty(self, professional_ids):
+        with self._lock:
+            self._dirty.update(professional_ids)
+            if self._building is not None:
+                self._building.update(professional_ids)
+
+    def refresh(self, session):
+        """
+        Recarrega os profissionais sujos. Se o índice estiver velho, dispara a reconstrução
+        completa em segundo plano; só a primeira, sem índice para responder, é feita aqui.
+        """
+        if self._built_at is None:
+            with self._rebuild_lock:
+                if self._built_at is None:
+                    self._rebuild(session)
+        elif time.monotonic() - self._built_at > FULL_REFRESH_SECONDS and self._rebuild_lock.acquire(blocking=False):
+            threading.Thread(target=self._rebuild_in_background, args=(session.get_bind(),), daemon=True).start()
+
+        with self._lock:
+            if self._dirty:
+                dirty, self._dirty = self._dirty, set()
+                self._reload(session, dirty)
+
+    def nearest(self, profession, latitude, longitude, k, start_time, end_time):
+        key = _profession_key(profession)
+        with self._lock:
+            bounds = self._bounds.get(key)
+            if bounds is None:
+                return []
+
+            row, col = _cell(latitude, longitude)
+            min_row, max_row, min_col, max_col = bounds
+            max_radius = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+
+            found = []
+            for radius in range(max_radius + 1):
+                for cell in _ring(row, col, radius):
+                    for professional_id, entry in self._cells.get((key, cell), {}).items():
+                        if self._is_available(professional_id, start_time, end_time):
+                            distance = haversine(latitude, longitude, entry["latitude"], entry["longitude"])
+                            found.append((distance, entry))
+                if len(found) >= k:
+                    found.sort(key=lambda item: item[0])
+                    # Quem está fora deste anel fica a pelo menos `radius` células do cliente
+                    worst_latitude = min(abs(latitude) + (radius + 1) * CELL_SIZE_DEGREES, 89.0)
+                    outside_km = radius * CELL_SIZE_DEGREES * KM_PER_DEGREE * cos(radians(worst_latitude))
+                    if found[k - 1][0] <= outside_km:
+                        break
+
+        found.sort(key=lambda item: (item[0], not item[1]["is_master"], -item[1]["rating"]))
+        return [dict(entry, distance=distance) for distance, entry in found[:k]]
+
+    def _is_available(self, professional_id, start_time, end_time):
+        return not any(start < end_time and end > start_time for start, end in self._blocks.get(professional_id, ()))
+
+    def _rebuild_in_background(self, engine):
+        session = Session(bind=engine)
+        try:
+            self._rebuild(session)
+        except Exception:
+            logger.exception("Falha ao reconstruir o índice de despacho")
+        finally:
+            session.close()
+            self._rebuild_lock.release()
+
+    def _rebuild(self, session):
+        """Monta um índice novo sem segurar o lock e o troca pelo atual"""
+        with self._lock:
+            # A leitura abaixo já enxerga os commits marcados até aqui
+            cleared, self._dirty = self._dirty, set()
+            self._building = set()
+        fresh = DispatchIndex()
+        try:
+            fresh._load(session)
+        except Exception:
+            with self._lock:
+                self._dirty.update(cleared, self._building)
+                self._building = None
+            raise
+        with self._lock:
+            # Quem mudou durante a leitura pode ter vindo com o estado antigo: recarrega depois
+            self._dirty.update(self._building)
+            self._building = None
+            self._locations, self._cells, self._bounds, self._blocks = (
+                fresh._locations, fresh._cells, fresh._bounds, fresh._blocks
+            )
+            self._built_at = time.monotonic()
+
+    def _reload(self, session, professional_ids):
+        for professional_id in professional_ids:
+            self._remove(professional_id)
+        self._load(session, professional_ids)
+
+    def _remove(self, professional_id):
+        self._blocks.pop(professional_id, None)
+        location = self._locations.pop(professional_id, None)
+        if location:
+            self._cells[location].pop(professional_id, None)
+
+    def _load(self, session, professional_ids=None):
+        query = session.query(Professional, Subscription.plan).join(
+            Subscription, Professional.id == Subscription.professional_id
+        ).filter(
+            Subscription.status == 'active',
+            Professional.latitude.isnot(None),
+            Professional.longitude.isnot(None)
+        )
+        schedules = session.query(Schedule.professional_id, Schedule.start_time, Schedule.end_time).filter(
+            Schedule.status == 'BLOCKED',
+            Schedule.end_time > datetime.utcnow()
+        )
+        if professional_ids is not None:
+            query = query.filter(Professional.id.in_(professional_ids))
+            schedules = schedules.filter(Schedule.professional_id.in_(professional_ids))
+
+        for professional, plan in query:
+            entry = {
+                "id": professional.id,
+                "name": professional.name,
+                "profession": professional.profession,
+                "city": professional.city,
+                "state": professional.state,
+                "rating": professional.rating,
+                "reviews": professional.reviews,
+                "latitude": professional.latitude,
+                "longitude": professional.longitude,
+                "plan": plan,
+                "is_master": plan == "Master"
+            }
+            key = _profession_key(professional.profession)
+            cell = _cell(professional.latitude, professional.longitude)
+            self._locations[professional.id] = (key, cell)
+            self._cells[(key, cell)][professional.id] = entry
+            self._extend_bounds(key, cell)
+
+        for professional_id, start_time, end_time in schedules:
+            self._blocks[professional_id].append((start_time, end_time))
+
+    def _extend_bounds(self, key, cell):
+        row, col = cell
+        if key not in self._bounds:
+            self._bounds[key] = (row, row, col, col)
+        else:
+            min_row, max_row, min_col, max_col = self._bounds[key]
+            self._bounds[key] = (min(min_row, row), max(max_row, row), min(min_col, col), max(max_col, col))
+
+dispatch_index = DispatchIndex()
+
+# ==================== INVALIDAÇÃO INCREMENTAL ====================
+
+def _affected_professional_id(instance):
+    if isinstance(instance, Professional):
+        return instance.id
+    if isinstance(instance, (Subscription, Schedule)):
+        return instance.professional_id
+    return None
+
+@event.listens_for(Session, "after_flush")
+def _collect_dispatch_changes(session, flush_context):
+    pending = session.info.setdefault("dispatch_dirty", set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        professional_id = _affected_professional_id(instance)
+        if professional_id is not None:
+            pending.add(professional_id)
+
+@event.listens_for(Session, "after_commit")
+def _publish_dispatch_changes(session):
+    pending = session.info.pop("dispatch_dirty", None)
+    if pending:
+        dispatch_index.mark_dirty(pending)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_dispatch_changes(session):
+    session.info.pop("dispatch_dirty", None)
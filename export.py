@@ -0,0 +1,166 @@
+"""
+Exportação em streaming (NDJSON ou CSV) de métricas, mensagens e agendamentos para análise.
+
+As linhas são lidas do banco em lotes (yield_per) e escritas em blocos, então o uso de memória
+é constante qualquer que seja o tamanho da tabela. Exportações incrementais usam uma marca
+d'água: só saem linhas com last_updated (métricas), sent_at (mensagens) ou id (agendamentos)
+maior que `since`. A exportação de mensagens inclui as arquivadas em MessageArchive, e a taxa
+de conversão das métricas é calculada por linha, como no dashboard.
+
+Para rodar:
+    python export.py messages --format csv --since 2025-10-01T00:00:00 > mensagens.csv
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from operator import attrgetter
+from datetime import datetime, date, timezone
+from sqlalchemy import select
+from models import ProfessionalMetrics, Message, MessageArchive, Schedule
+from archive import decode_segment
+from helpers import conversion_rate
+
+BATCH_SIZE = 1000   # linhas por ida ao banco
+CHUNK_ROWS = 1000   # linhas por bloco enviado ao cliente
+
+# dataset -> (modelo, coluna de marca d'água, campos exportados)
+DATASETS = {
+    "metrics": (ProfessionalMetrics, "last_updated", [
+        "professional_id", "profile_views", "profile_views_this_month",
+        "whatsapp_clicks", "whatsapp_clicks_this_month",
+        "chat_conversations", "chat_conversations_this_month",
+        "total_appointments", "appointments_this_month", "completed_appointments",
+        "conversion_rate", "last_updated"
+    ]),
+    "messages": (Message, "sent_at", [
+        "id", "chat_id", "sender_id", "sender_type", "content", "sent_at", "is_read"
+    ]),
+    "schedules": (Schedule, "id", [
+        "id", "professional_id", "start_time", "end_time", "status"
+    ]),
+}
+
+# Campos calculados a partir das colunas da linha em vez de lidos do banco
+COMPUTED_FIELDS = {
+    "conversion_rate": lambda row: round(conversion_rate(row), 2),
+}
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def parse_since(dataset, raw):
+    """Converte a marca d'água recebida como texto; ValueError se o formato for inválido"""
+    if not raw:
+        return None
+    _, watermark, _ = DATASETS[dataset]
+    if watermark == "id":
+        return int(raw)
+    since = datetime.fromisoformat(raw)
+    if since.tzinfo is not None:
+        # As datas são gravadas em UTC sem fuso
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+def iter_rows(session, dataset, since=None, batch_size=BATCH_SIZE):
+    """Gera tuplas na ordem de DATASETS[dataset][2], lendo o banco em lotes"""
+    model, watermark, fields = DATASETS[dataset]
+    watermark_column = getattr(model, watermark)
+
+    if dataset == "messages":
+        yield from _iter_archived_messages(session, since)
+
+    columns = [field for field in fields if field not in COMPUTED_FIELDS]
+    query = select(*(getattr(model, field) for field in columns)).order_by(watermark_column)
+    if since is not None:
+        query = query.where(watermark_column > since)
+    rows = session.execute(query.execution_options(yield_per=batch_size))
+
+    if len(columns) == len(fields):
+        for row in rows:
+            yield tuple(row)
+        return
+
+    getters = [COMPUTED_FIELDS.get(field) or attrgetter(field) for field in fields]
+    for row in rows:
+        yield tuple(get(row) for get in getters)
+
+def _iter_archived_messages(session, since):
+    query = select(MessageArchive.chat_id, MessageArchive.payload).order_by(MessageArchive.id)
+    if since is not None:
+        query = query.where(MessageArchive.last_sent_at > since)
+
+    # Segmentos já agrupam centenas de mensagens; lotes menores mantêm a memória baixa
+    for chat_id, payload in session.execute(query.execution_options(yield_per=10)):
+        for m in decode_segment(payload):
+            if since is None or m.sent_at > since:
+                yield (m.id, chat_id, m.sender_id, m.sender_type, m.content, m.sent_at, m.is_read)
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+def ndjson_chunks(fields, rows, chunk_rows=CHUNK_ROWS):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(fields, row)), default=_json_default, ensure_ascii=False))
+        if len(lines) >= chunk_rows:
+            yield "\n".join(lines) + "\n"
+            lines.clear()
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+def csv_chunks(fields, rows, chunk_rows=CHUNK_ROWS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    pending = 0
+    for row in rows:
+        writer.writerow([value.isoformat() if isinstance(value, (datetime, date)) else value for value in row])
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+def export_chunks(session, dataset, fmt, since=None):
+    """Gera o dataset já formatado, bloco a bloco"""
+    fields = DATASETS[dataset][2]
+    rows = iter_rows(session, dataset, since)
+    if fmt == "csv":
+        return csv_chunks(fields, rows)
+    return ndjson_chunks(fields, rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta dados para análise em NDJSON ou CSV.")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    parser.add_argument("--since", help="marca d'água: data ISO 8601 (métricas, mensagens) ou id (agendamentos)")
+    parser.add_argument("--output", help="arquivo de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    try:
+        since = parse_since(args.dataset, args.since)
+    except ValueError:
+        parser.error("--since inválido para este dataset")
+
+    from app import create_db_app
+    from models import db
+
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        with create_db_app().app_context():
+            for chunk in export_chunks(db.session, args.dataset, args.format, since):
+                output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Funções auxiliares compartilhadas entre o servidor síncrono (app.py) e o assíncrono (async_app.py).
+Mantê-las em um só lugar garante que os dois caminhos retornem exatamente o mesmo JSON.
+"""
+from math import radians, sin, cos, sqrt, atan2, isfinite
+from sqlalchemy.dialects import postgresql, sqlite
+from models import Chat, Message
+from cache import professional_cache
+
+VALID_METRICS = [
+    'profile_views', 'profile_views_this_month',
+    'whatsapp_clicks', 'whatsapp_clicks_this_month',
+    'chat_conversations', 'chat_conversations_this_month',
+    'total_appointments', 'appointments_this_month',
+    'completed_appointments'
+]
+
+# Máximo de ids aceitos por /api/professionals:batch
+MAX_BATCH_SIZE = 300
+
+# Mesmo tamanho da coluna Message.idempotency_key
+MAX_IDEMPOTENCY_KEY_LENGTH = Message.__table__.c.idempotency_key.type.length
+
+# Máximo de mensagens por página em /api/chats/<id>/messages
+MAX_PAGE_SIZE = 200
+
+# Espera máxima (s) de um long-poll em /api/chats/<id>/messages/poll
+LONG_POLL_MAX_WAIT = 30
+
+def chat_upsert(dialect_name, client_id, professional_id, now, client_latitude=None, client_longitude=None, client_address=None):
+    """
+    INSERT ... ON CONFLICT que cria o chat ou reaproveita o existente em um único comando.
+    A localização só é sobrescrita quando latitude e longitude são informadas.
+    RETURNING traz id e created_at: o chat é novo se created_at == now.
+    """
+    stmt = _dialect_insert(dialect_name, Chat).values(
+        client_id=client_id,
+        professional_id=professional_id,
+        created_at=now,
+        last_message_at=now,
+        client_latitude=client_latitude,
+        client_longitude=client_longitude,
+        client_address=client_address
+    )
+    if client_latitude is not None and client_longitude is not None:
+        update = {
+            "client_latitude": stmt.excluded.client_latitude,
+            "client_longitude": stmt.excluded.client_longitude,
+            "client_address": stmt.excluded.client_address
+        }
+    else:
+        # DO NOTHING não retorna a linha existente; a atualização vazia garante o RETURNING
+        update = {"client_id": stmt.excluded.client_id}
+    return stmt.on_conflict_do_update(
+        index_elements=[Chat.client_id, Chat.professional_id], set_=update
+    ).returning(Chat.id, Chat.created_at)
+
+def message_insert(dialect_name, chat_id, sender_id, sender_type, content, now, idempotency_key=None):
+    """
+    Insere a mensagem; se a chave de idempotência já existir no chat, retorna a mensagem original.
+    A mensagem é nova se sent_at == now.
+    """
+    stmt = _dialect_insert(dialect_name, Message).values(
+        chat_id=chat_id,
+        sender_id=sender_id,
+        sender_type=sender_type,
+        content=content,
+        sent_at=now,
+        is_read=False,
+        idempotency_key=idempotency_key
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[Message.chat_id, Message.idempotency_key],
+        set_={"idempotency_key": stmt.excluded.idempotency_key}
+    ).returning(Message.id, Message.sender_id, Message.sender_type, Message.content, Message.sent_at, Message.is_read)
+
+def idempotency_key(body_value, header_value):
+    """
+    Chave de idempotência de send_message: campo `idempotency_key` do JSON ou, sem ele, o
+    header Idempotency-Key. ValueError com a mensagem de erro se não for uma string de 1 a
+    MAX_IDEMPOTENCY_KEY_LENGTH caracteres.
+    """
+    key = body_value if body_value is not None else header_value
+    if key is None:
+        return None
+    if not isinstance(key, str) or not 1 <= len(key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise ValueError(f"idempotency_key deve ser uma string de 1 a {MAX_IDEMPOTENCY_KEY_LENGTH} caracteres.")
+    return key
+
+def _dialect_insert(dialect_name, model):
+    """INSERT com suporte a ON CONFLICT para o banco em uso (SQLite ou PostgreSQL)"""
+    dialect = postgresql if dialect_name == "postgresql" else sqlite
+    return dialect.insert(model)
+
+def haversine(lat1, lon1, lat2, lon2):
+    R = 6371  # Raio da Terra em quilômetros
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    distance = R * c
+    return distance
+
+def serialize_search_result(professional, plan):
+    return {
+        "id": professional.id,
+        "name": professional.name,
+        "profession": professional.profession,
+        "city": professional.city,
+        "state": professional.state,
+        "rating": professional.rating,
+        "reviews": professional.reviews,
+        "latitude": professional.latitude,
+        "longitude": professional.longitude,
+        "plan": plan,
+        "is_master": plan == "Master",
+        "distance": None
+    }
+
+def rank_search_results(results, user_latitude, user_longitude):
+    """Ordena os resultados da busca: Plano Master, avaliação e distância (RF 2.3.2)"""
+    if user_latitude is not None and user_longitude is not None:
+        for prof in results:
+            if prof["latitude"] is not None and prof["longitude"] is not None:
+                prof["distance"] = haversine(user_latitude, user_longitude, prof["latitude"], prof["longitude"])
+        results.sort(key=lambda x: (x["is_master"], x["rating"], x["distance"] if x["distance"] is not None else float("inf")), reverse=True)
+    else:
+        results.sort(key=lambda x: (x["is_master"], x["rating"]), reverse=True)
+    return results
+
+def serialize_chat(chat, professional, last_message, unread_count):
+    return {
+        "id": chat.id,
+        "client_id": chat.client_id,
+        "professional_id": chat.professional_id,
+        "professional_name": professional.name,
+        "professional_profession": professional.profession,
+        "last_message": last_message.content if last_message else None,
+        "last_message_at": last_message.sent_at.isoformat() if last_message else chat.created_at.isoformat(),
+        "unread_count": unread_count,
+        "client_latitude": chat.client_latitude,
+        "client_longitude": chat.client_longitude,
+        "client_address": chat.client_address
+    }
+
+def serialize_message(msg):
+    return {
+        "id": msg.id,
+        "sender_id": msg.sender_id,
+        "sender_type": msg.sender_type,
+        "content": msg.content,
+        "sent_at": msg.sent_at.isoformat(),
+        "is_read": msg.is_read
+    }
+
+def conversion_rate(metrics):
+    """Percentual de visualizações que resultaram em contato (WhatsApp ou chat)"""
+    if metrics.profile_views > 0:
+        total_contacts = metrics.whatsapp_clicks + metrics.chat_conversations
+        return (total_contacts / metrics.profile_views) * 100
+    return 0.0
+
+def serialize_metrics(metrics, rate):
+    return {
+        "profile_views": metrics.profile_views,
+        "profile_views_this_month": metrics.profile_views_this_month,
+        "whatsapp_clicks": metrics.whatsapp_clicks,
+        "whatsapp_clicks_this_month": metrics.whatsapp_clicks_this_month,
+        "chat_conversations": metrics.chat_conversations,
+        "chat_conversations_this_month": metrics.chat_conversations_this_month,
+        "total_appointments": metrics.total_appointments,
+        "appointments_this_month": metrics.appointments_this_month,
+        "completed_appointments": metrics.completed_appointments,
+        "conversion_rate": round(rate, 2)
+    }
+
+def normalize_batch_ids(ids):
+    """Remove vazios e duplicados preservando a ordem; None se a entrada não for uma lista de strings"""
+    if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+        return None
+    return list(dict.fromkeys(i.strip() for i in ids if i.strip()))
+
+def serialize_professional_summary(professional, subscription, metrics):
+    return {
+        "id": professional.id,
+        "name": professional.name,
+        "profession": professional.profession,
+        "city": professional.city,
+        "state": professional.state,
+        "rating": professional.rating,
+        "reviews": professional.reviews,
+        "latitude": professional.latitude,
+        "longitude": professional.longitude,
+        "plan": subscription.plan if subscription else "Nenhum",
+        "is_master": subscription.plan == "Master" if subscription else False,
+        "subscription_status": subscription.status if subscription else "inactive",
+        "metrics": serialize_metrics(metrics, conversion_rate(metrics)) if metrics else None
+    }
+
+def batch_ids(method, body, query):
+    """
+    Ids pedidos a /api/professionals:batch (JSON no POST, `?ids=` separado por vírgulas no GET).
+    ValueError com a mensagem de erro se faltarem ou passarem de MAX_BATCH_SIZE.
+    """
+    if method == "POST":
+        ids = normalize_batch_ids(body.get("ids") if isinstance(body, dict) else None)
+    else:
+        ids = normalize_batch_ids((query or "").split(","))
+    if not ids:
+        raise ValueError("O parâmetro 'ids' é obrigatório.")
+    if len(ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"Máximo de {MAX_BATCH_SIZE} ids por requisição.")
+    return ids
+
+def cached_profiles(ids):
+    """Perfis ainda válidos no cache e a lista dos ids que precisam ir ao banco"""
+    profiles = professional_cache.get_many(ids)
+    return profiles, [professional_id for professional_id in ids if professional_id not in profiles]
+
+def cache_profiles(profiles, professionals, subscriptions, metrics):
+    """Serializa e guarda no cache os perfis lidos; subscriptions e metrics são mapas id -> linha"""
+    for professional in professionals:
+        profile = serialize_professional_summary(professional, subscriptions.get(professional.id), metrics.get(professional.id))
+        professional_cache.set(professional.id, profile)
+        profiles[professional.id] = profile
+    return profiles
+
+def batch_result(ids, profiles):
+    return {
+        "status": "success",
+        "professionals": [profiles[professional_id] for professional_id in ids if professional_id in profiles],
+        "not_found": [professional_id for professional_id in ids if professional_id not in profiles]
+    }
+
+def page_limit(value):
+    """
+    Tamanho de página (`?limit=`) de get_messages; None sem paginação.
+    ValueError com a mensagem de erro se não for um inteiro entre 1 e MAX_PAGE_SIZE.
+    """
+    if value is None:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"O parâmetro 'limit' deve ser um inteiro entre 1 e {MAX_PAGE_SIZE}.")
+    return limit
+
+def poll_wait(value):
+    """
+    Segundos de espera de um long-poll (`?wait=`), limitados a 0..LONG_POLL_MAX_WAIT.
+    ValueError com a mensagem de erro se não for um número finito.
+    """
+    if value is None:
+        return LONG_POLL_MAX_WAIT
+    try:
+        wait = float(value)
+    except ValueError:
+        wait = None
+    if wait is None or not isfinite(wait):
+        raise ValueError("O parâmetro 'wait' deve ser um número de segundos.")
+    return max(0.0, min(wait, LONG_POLL_MAX_WAIT))
+
+def serialize_dashboard(professional, subscription, metrics, active_chats, upcoming_schedules):
+    return {
+        "professional": {
+            "id": professional.id,
+            "name": professional.name,
+            "profession": professional.profession,
+            "city": professional.city,
+            "state": professional.state,
+            "rating": professional.rating,
+            "reviews": professional.reviews
+        },
+        "subscription": {
+            "plan": subscription.plan if subscription else "Nenhum",
+            "status": subscription.status if subscription else "inactive",
+            "due_date": subscription.due_date.isoformat() if subscription and subscription.due_date else None
+        },
+        "metrics": serialize_metrics(metrics, conversion_rate(metrics)),
+        "active_chats": active_chats,
+        "upcoming_schedules": [
+            {
+                "id": schedule.id,
+                "start_time": schedule.start_time.isoformat(),
+                "end_time": schedule.end_time.isoformat(),
+                "status": schedule.status
+            }
+            for schedule in upcoming_schedules
+        ]
+    }
@@ -0,0 +1,140 @@
+"""
+Migrações do esquema para bancos criados por versões anteriores.
+
+db.create_all() só cria as tabelas que faltam; colunas, índices e restrições novos em tabelas
+já existentes são aplicados aqui. Cada passo confere o estado do banco antes de agir, então
+rodar de novo não muda nada. Chamado por init_db().
+"""
+from datetime import datetime
+from sqlalchemy import inspect, select, update, delete, func, text, UniqueConstraint
+from models import db, Chat, Message, MessageArchive
+
+def upgrade_schema(connection):
+    """Aplica os passos pendentes e retorna a descrição de cada um"""
+    applied = []
+
+    if connection.dialect.name == "sqlite" and not _has_autoincrement(connection, "message"):
+        _rebuild_message_table(connection)
+        applied.append("message: tabela recriada com AUTOINCREMENT")
+
+    inspector = inspect(connection)
+    chat_indexes = _index_names(inspector, "chat")
+    message_columns = {column["name"] for column in inspector.get_columns("message")}
+    message_indexes = _index_names(inspector, "message")
+
+    if "uq_chat_client_professional" not in chat_indexes:
+        # O SELECT-e-INSERT antigo de create_or_get_chat pode ter criado chats repetidos
+        merged = _merge_duplicate_chats(connection)
+        connection.execute(text(
+            "CREATE UNIQUE INDEX uq_chat_client_professional ON chat (client_id, professional_id)"
+        ))
+        applied.append(f"chat: índice único (client_id, professional_id), {merged} chats duplicados mesclados")
+
+    if "idempotency_key" not in message_columns:
+        column_type = Message.__table__.c.idempotency_key.type.compile(connection.dialect)
+        connection.execute(text(f"ALTER TABLE message ADD COLUMN idempotency_key {column_type}"))
+        applied.append("message: coluna idempotency_key")
+
+    if "uq_message_idempotency" not in message_indexes:
+        next(index for index in Message.__table__.indexes if index.name == "uq_message_idempotency").create(connection)
+        applied.append("message: índice único (chat_id, idempotency_key)")
+
+    return applied
+
+def schema_problems(connection):
+    """Diferenças que restam entre os modelos e o banco: tabelas, colunas e índices faltando"""
+    inspector = inspect(connection)
+    problems = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            problems.append(f"tabela {table.name}")
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        problems += [f"coluna {table.name}.{column.name}" for column in table.columns if column.name not in columns]
+        expected = {index.name for index in table.indexes} | {
+            constraint.name for constraint in table.constraints
+            if isinstance(constraint, UniqueConstraint) and constraint.name
+        }
+        problems += [f"índice {name}" for name in sorted(expected - _index_names(inspector, table.name))]
+    return problems
+
+def _index_names(inspector, table):
+    # Restrições UNIQUE declaradas na tabela aparecem como constraint, não como índice
+    return (
+        {index["name"] for index in inspector.get_indexes(table)}
+        | {constraint["name"] for constraint in inspector.get_unique_constraints(table)}
+    )
+
+def _merge_duplicate_chats(connection):
+    """
+    Junta chats repetidos do mesmo par cliente/profissional no de menor id: mensagens e
+    segmentos arquivados passam para ele, que fica com a localização do chat mais recente.
+    Retorna quantos chats foram removidos.
+    """
+    chat = Chat.__table__
+    pairs = connection.execute(
+        select(chat.c.client_id, chat.c.professional_id)
+        .group_by(chat.c.client_id, chat.c.professional_id)
+        .having(func.count() > 1)
+    ).all()
+
+    removed = 0
+    for client_id, professional_id in pairs:
+        chats = connection.execute(
+            select(chat).where(chat.c.client_id == client_id, chat.c.professional_id == professional_id).order_by(chat.c.id)
+        ).all()
+        keep, duplicate_ids = chats[0], [c.id for c in chats[1:]]
+        located = [c for c in chats if c.client_latitude is not None and c.client_longitude is not None]
+        location = max(located, key=lambda c: c.last_message_at or c.created_at or datetime.min) if located else keep
+
+        connection.execute(update(Message.__table__).where(Message.chat_id.in_(duplicate_ids)).values(chat_id=keep.id))
+        connection.execute(update(MessageArchive.__table__).where(MessageArchive.chat_id.in_(duplicate_ids)).values(chat_id=keep.id))
+        connection.execute(update(chat).where(chat.c.id == keep.id).values(
+            created_at=min((c.created_at for c in chats if c.created_at), default=None),
+            last_message_at=max((c.last_message_at for c in chats if c.last_message_at), default=None),
+            client_latitude=location.client_latitude,
+            client_longitude=location.client_longitude,
+            client_address=location.client_address
+        ))
+        connection.execute(delete(chat).where(chat.c.id.in_(duplicate_ids)))
+        removed += len(duplicate_ids)
+
+    return removed
+
+def _has_autoincrement(connection, table):
+    sql = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+    ).scalar()
+    return "AUTOINCREMENT" in sql.upper()
+
+def _rebuild_message_table(connection):
+    """
+    Recria a tabela message com AUTOINCREMENT, que o SQLite não permite acrescentar com ALTER.
+    Sem ele, ids de mensagens movidas para o arquivo voltam a ser usados e a paginação por id
+    mistura mensagens. O contador parte do maior id já usado, na tabela ou no arquivo.
+    Ids reutilizados antes desta migração não têm como ser corrigidos.
+    """
+    old_columns = {column["name"] for column in inspect(connection).get_columns("message")}
+    columns = ", ".join(column.name for column in Message.__table__.columns if column.name in old_columns)
+    old_indexes = _index_names(inspect(connection), "message")
+
+    connection.exec_driver_sql("SAVEPOINT rebuild_message")
+    try:
+        for index in Message.__table__.indexes:
+            if index.name in old_indexes:
+                connection.exec_driver_sql(f"DROP INDEX {index.name}")
+        connection.exec_driver_sql("ALTER TABLE message RENAME TO message_old")
+        Message.__table__.create(connection)
+        connection.exec_driver_sql(f"INSERT INTO message ({columns}) SELECT {columns} FROM message_old")
+        connection.exec_driver_sql("DROP TABLE message_old")
+
+        highest_id = max(
+            connection.execute(select(func.max(Message.id))).scalar() or 0,
+            connection.execute(select(func.max(MessageArchive.last_message_id))).scalar() or 0
+        )
+        connection.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'message'")
+        connection.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('message', ?)", (highest_id,))
+        connection.exec_driver_sql("RELEASE rebuild_message")
+    except Exception:
+        connection.exec_driver_sql("ROLLBACK TO rebuild_message")
+        raise
@@ -43,6 +43,9 @@ class Schedule(db.Model):
         return f'<Schedule {self.professional_id} - {self.start_time.strftime("%Y-%m-%d %H:%M")}>'
 
 class Chat(db.Model):
+    # Um único chat por par cliente/profissional (permite o upsert em create_or_get_chat)
+    __table_args__ = (db.UniqueConstraint('client_id', 'professional_id', name='uq_chat_client_professional'),)
+
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.String, nullable=False)  # ID do cliente
     professional_id = db.Column(db.String, db.ForeignKey('professional.id'), nullable=False)
@@ -56,12 +59,20 @@ class Chat(db.Model):
     
     # Relacionamentos
     messages = db.relationship('Message', backref='chat', lazy='dynamic', cascade="all, delete-orphan", order_by="Message.sent_at")
+    archived_segments = db.relationship('MessageArchive', backref='chat', lazy='dynamic', cascade="all, delete-orphan", order_by="MessageArchive.last_message_id.desc()")
     professional = db.relationship('Professional', backref='chats')
 
     def __repr__(self):
         return f'<Chat {self.id} - Client: {self.client_id}, Professional: {self.professional_id}>'
 
 class Message(db.Model):
+    __table_args__ = (
+        # Reenvios com a mesma chave de idempotência não duplicam a mensagem (NULLs não conflitam)
+        db.Index('uq_message_idempotency', 'chat_id', 'idempotency_key', unique=True),
+        # AUTOINCREMENT impede que o SQLite reutilize ids de mensagens movidas para o arquivo
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     chat_id = db.Column(db.Integer, db.ForeignKey('chat.id'), nullable=False)
     sender_id = db.Column(db.String, nullable=False)  # ID do remetente (cliente ou profissional)
@@ -69,10 +80,26 @@ class Message(db.Model):
     content = db.Column(db.Text, nullable=False)
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_read = db.Column(db.Boolean, default=False)
+    idempotency_key = db.Column(db.String(64), nullable=True)  # Gerada pelo cliente para reenvios seguros
 
     def __repr__(self):
         return f'<Message {self.id} - Chat: {self.chat_id}, From: {self.sender_type}>'
 
+class MessageArchive(db.Model):
+    """Segmento comprimido com mensagens antigas de um chat (armazenamento frio)"""
+    id = db.Column(db.Integer, primary_key=True)
+    chat_id = db.Column(db.Integer, db.ForeignKey('chat.id'), nullable=False, index=True)
+    first_message_id = db.Column(db.Integer, nullable=False)
+    last_message_id = db.Column(db.Integer, nullable=False)
+    first_sent_at = db.Column(db.DateTime, nullable=False)
+    last_sent_at = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)  # JSON comprimido com zlib
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MessageArchive {self.id} - Chat: {self.chat_id}, {self.message_count} mensagens>'
+
 class ProfessionalMetrics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     professional_id = db.Column(db.String, db.ForeignKey('professional.id'), unique=True, nullable=False)
@@ -0,0 +1,362 @@
+"""
+Rate limiting e controle de admissão para os endpoints de escrita.
+
+Todas as escritas disputam o único lock de escrita do SQLite. Duas camadas evitam que um
+cliente em loop (ex.: profile_view disparado sem parar) trave as escritas dos demais:
+
+1. Token bucket por chave (cliente ou profissional): RATE_LIMIT_RATE tokens/s, rajadas de
+   até RATE_LIMIT_BURST. O estado fica em memória (MemoryStore) ou, para compartilhar entre
+   processos, em um arquivo SQLite local (SQLiteStore, configurado com
+   RATE_LIMIT_STORE = "sqlite:///caminho.db"), que faz o papel de um Redis.
+2. Fila de escrita limitada: no máximo WRITE_CONCURRENCY escritas simultâneas e
+   WRITE_QUEUE_SIZE aguardando até WRITE_QUEUE_TIMEOUT segundos. Acima disso a requisição é
+   descartada na hora, o que mantém o p99 das escritas admitidas limitado.
+
+Rejeições respondem 429 com Retry-After, inclusive quando o arquivo do SQLiteStore continua
+travado depois de STORE_TIMEOUT segundos. Os contadores ficam em GET /api/status/writes.
+"""
+import asyncio
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from functools import wraps
+from flask import current_app, request, jsonify
+
+DEFAULTS = {
+    "RATE_LIMIT_RATE": 5.0,
+    "RATE_LIMIT_BURST": 20,
+    "RATE_LIMIT_STORE": "memory",
+    "WRITE_CONCURRENCY": 4,
+    "WRITE_QUEUE_SIZE": 32,
+    "WRITE_QUEUE_TIMEOUT": 2.0,
+}
+
+# Acima deste número de chaves, buckets já recarregados são descartados
+MAX_TRACKED_KEYS = 10000
+
+# Espera máxima (s) pelo lock do arquivo do SQLiteStore
+STORE_TIMEOUT = 1.0
+
+logger = logging.getLogger(__name__)
+
+class MemoryStore:
+    """Buckets em memória, por processo"""
+
+    blocking = False
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._prune_at = MAX_TRACKED_KEYS
+
+    def take(self, key, rate, burst, now):
+        """Consome um token; retorna 0 se permitido ou quantos segundos faltam para o próximo"""
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            if len(self._buckets) > self._prune_at:
+                self._prune(rate, burst, now)
+                # Se quase todos continuam ativos, a próxima varredura só vem quando o número de
+                # chaves dobrar: o custo por take fica O(1) amortizado
+                self._prune_at = max(MAX_TRACKED_KEYS, 2 * len(self._buckets))
+            return 0.0 if allowed else (1 - tokens) / rate
+
+    def _prune(self, rate, burst, now):
+        # Bucket cheio equivale a bucket inexistente
+        for key, (tokens, updated_at) in list(self._buckets.items()):
+            if tokens + (now - updated_at) * rate >= burst:
+                del self._buckets[key]
+
+class SQLiteStore:
+    """Buckets em um arquivo SQLite local, compartilhados entre processos da mesma máquina"""
+
+    # Faz I/O (e espera pelo lock do arquivo): o servidor assíncrono chama fora do event loop
+    blocking = True
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS rate_limit_bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=STORE_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, rate, burst, now):
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT tokens, updated_at FROM rate_limit_bucket WHERE key = ?", (key,)).fetchone()
+            tokens, updated_at = row if row else (burst, now)
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            connection.execute(
+                "INSERT INTO rate_limit_bucket (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens - 1 if allowed else tokens, now)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        return 0.0 if allowed else (1 - tokens) / rate
+
+class WriteStats:
+    """Contadores de admissão publicados em /api/status/writes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            "admitted": 0,
+            "rejected_rate_limit": 0,
+            "rejected_store_busy": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "queued_total": 0,
+            "queued_now": 0,
+            "queued_peak": 0,
+            "running_now": 0,
+        }
+        self._queue_wait_max = 0.0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+            if name == "queued_now":
+                self._counters["queued_peak"] = max(self._counters["queued_peak"], self._counters["queued_now"])
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self._queue_wait_max = max(self._queue_wait_max, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters, queue_wait_max_ms=round(self._queue_wait_max * 1000, 1))
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        self.reason = reason
+        self.retry_after = retry_after
+
+class WriteQueue:
+    """
+    Vagas de escrita com fila de espera limitada (para servidores com threads).
+    A fila é FIFO: uma vaga liberada passa direto para o primeiro da fila, e quem chega com
+    gente esperando entra atrás, em vez de tomar a vaga e deixar a fila estourar o timeout.
+    """
+
+    def __init__(self, concurrency, max_queued, timeout, stats):
+        self._lock = threading.Lock()
+        self._free = concurrency
+        self._waiters = deque()  # threading.Event de cada requisição na fila, em ordem de chegada
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.stats = stats
+
+    @contextmanager
+    def admit(self):
+        self._acquire()
+        self.stats.incr("running_now")
+        try:
+            yield
+        finally:
+            self.stats.incr("running_now", -1)
+            self._release()
+
+    def _acquire(self):
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            if len(self._waiters) >= self.max_queued:
+                self.stats.incr("rejected_queue_full")
+                raise Rejected("queue_full", self.timeout)
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        self.stats.incr("queued_total")
+        self.stats.incr("queued_now")
+        started = time.monotonic()
+        granted = waiter.wait(self.timeout)
+        with self._lock:
+            # A vaga pode ter chegado junto com o timeout
+            granted = granted or waiter.is_set()
+            if not granted:
+                self._waiters.remove(waiter)
+        self.stats.incr("queued_now", -1)
+        self.stats.record_wait(time.monotonic() - started)
+        if not granted:
+            self.stats.incr("rejected_queue_timeout")
+            raise Rejected("queue_timeout", self.timeout)
+
+    def _release(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._free += 1
+
+class AsyncWriteQueue:
+    """Mesma política de WriteQueue para o servidor assíncrono (um único event loop)"""
+
+    def __init__(self, concurrency, max_queued, timeout, stats):
+        self._free = concurrency
+        self._waiters = deque()  # asyncio.Future de cada requisição na fila, em ordem de chegada
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.stats = stats
+
+    @asynccontextmanager
+    async def admit(self):
+        await self._acquire()
+        self.stats.incr("running_now")
+        try:
+            yield
+        finally:
+            self.stats.incr("running_now", -1)
+            self._release()
+
+    async def _acquire(self):
+        if self._free and not self._waiters:
+            self._free -= 1
+            return
+        if len(self._waiters) >= self.max_queued:
+            self.stats.incr("rejected_queue_full")
+            raise Rejected("queue_full", self.timeout)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats.incr("queued_total")
+        self.stats.incr("queued_now")
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except asyncio.TimeoutError:
+            # A vaga pode ter chegado junto com o timeout
+            if not waiter.done():
+                self._waiters.remove(waiter)
+                self.stats.incr("rejected_queue_timeout")
+                raise Rejected("queue_timeout", self.timeout)
+        except asyncio.CancelledError:
+            # Requisição cancelada (cliente desconectou): devolve a vaga se ela já tinha chegado
+            if waiter.done():
+                self._release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            self.stats.incr("queued_now", -1)
+            self.stats.record_wait(time.monotonic() - started)
+
+    def _release(self):
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self._free += 1
+
+def create_store(uri):
+    if uri.startswith("sqlite:///"):
+        return SQLiteStore(uri[len("sqlite:///"):])
+    return MemoryStore()
+
+class WriteLimiter:
+    """
+    Extensão para Flask e Quart: `write_limiter.init_app(app)` e `@write_limited(...)` (ou
+    `@async_write_limited(...)` no servidor assíncrono) nas rotas de escrita.
+    """
+
+    def init_app(self, app, queue_class=WriteQueue):
+        for name, value in DEFAULTS.items():
+            app.config.setdefault(name, value)
+        stats = WriteStats()
+        app.extensions["write_limiter"] = {
+            "store": create_store(app.config["RATE_LIMIT_STORE"]),
+            "stats": stats,
+            "queue": queue_class(
+                app.config["WRITE_CONCURRENCY"], app.config["WRITE_QUEUE_SIZE"], app.config["WRITE_QUEUE_TIMEOUT"], stats
+            ),
+        }
+
+    @staticmethod
+    def check_rate(state, config, key):
+        """Lança Rejected se a chave estourou o token bucket ou se o store não respondeu a tempo"""
+        try:
+            wait = state["store"].take(key, config["RATE_LIMIT_RATE"], config["RATE_LIMIT_BURST"], time.time())
+        except sqlite3.OperationalError as error:
+            # Lock do arquivo disputado: liberar a escrita agravaria a disputa que o limite evita
+            logger.warning("Store do rate limit indisponível: %s", error)
+            state["stats"].incr("rejected_store_busy")
+            raise Rejected("store_busy", STORE_TIMEOUT)
+        if wait > 0:
+            state["stats"].incr("rejected_rate_limit")
+            raise Rejected("rate_limit", wait)
+
+write_limiter = WriteLimiter()
+
+def rejection_response(rejected, jsonify):
+    """Resposta 429 com Retry-After; recebe o jsonify do framework (Flask ou Quart)"""
+    retry_after = max(1, math.ceil(rejected.retry_after))
+    if rejected.reason == "rate_limit":
+        message = f"Muitas requisições. Tente novamente em {retry_after} segundo(s)."
+    else:
+        message = f"Servidor sobrecarregado. Tente novamente em {retry_after} segundo(s)."
+    payload = {"status": "error", "message": message, "reason": rejected.reason}
+    return jsonify(payload), 429, {"Retry-After": str(retry_after)}
+
+def rate_limit_key(data, view_args, remote_addr, body=None, path=None):
+    """Chave do bucket: parâmetro da URL (`path`) ou campo do JSON (`body`); usa o IP se faltar"""
+    if path:
+        return f"{path}:{view_args[path]}"
+    value = data.get(body) if isinstance(data, dict) else None
+    return f"{body}:{value or remote_addr}"
+
+def write_limited(body=None, path=None):
+    """Protege uma rota de escrita com o token bucket e a fila de escrita"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**view_args):
+            state = current_app.extensions["write_limiter"]
+            try:
+                key = rate_limit_key(request.get_json(silent=True) if body else None, view_args, request.remote_addr, body, path)
+                WriteLimiter.check_rate(state, current_app.config, key)
+                with state["queue"].admit():
+                    state["stats"].incr("admitted")
+                    return view(**view_args)
+            except Rejected as rejected:
+                return rejection_response(rejected, jsonify)
+        return wrapper
+    return decorator
+
+def async_write_limited(body=None, path=None):
+    """write_limited para o servidor assíncrono (Quart, com init_app(app, AsyncWriteQueue))"""
+    # Importado aqui para o app.py não carregar o Quart
+    from quart import current_app as quart_app, request as quart_request, jsonify as quart_jsonify
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(**view_args):
+            state = quart_app.extensions["write_limiter"]
+            try:
+                data = await quart_request.get_json(silent=True) if body else None
+                key = rate_limit_key(data, view_args, quart_request.remote_addr, body, path)
+                if state["store"].blocking:
+                    await asyncio.to_thread(WriteLimiter.check_rate, state, quart_app.config, key)
+                else:
+                    WriteLimiter.check_rate(state, quart_app.config, key)
+                async with state["queue"].admit():
+                    state["stats"].incr("admitted")
+                    return await view(**view_args)
+            except Rejected as rejected:
+                return rejection_response(rejected, quart_jsonify)
+        return wrapper
+    return decorator
@@ -0,0 +1,3 @@
+"""
+Blueprints da API: busca, chat, dashboard e exportação. Registrados em app.create_app().
+"""
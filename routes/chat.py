@@ -0,0 +1,208 @@
+"""
+Endpoints de chat entre clientes e profissionais.
+"""
+import time
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from models import db, Chat, Message, MessageArchive
+from archive import archive_floor, message_page, latest_archived
+from ratelimit import write_limited
+from helpers import chat_upsert, message_insert, idempotency_key, page_limit, poll_wait, serialize_chat, serialize_message
+
+chat_bp = Blueprint("chat", __name__)
+
+# Intervalo (segundos) entre as leituras do banco durante um long-poll
+LONG_POLL_INTERVAL = 0.5
+
+@chat_bp.route("/api/chats", methods=["GET"])
+def get_chats():
+    """Retorna todos os chats de um usuário (cliente ou profissional)"""
+    user_id = request.args.get("user_id")
+    user_type = request.args.get("user_type")  # 'client' ou 'professional'
+    
+    if not user_id or not user_type:
+        return jsonify({"status": "error", "message": "user_id e user_type são obrigatórios."}), 400
+    
+    if user_type == "client":
+        chats = Chat.query.filter_by(client_id=user_id).order_by(Chat.last_message_at.desc()).all()
+    elif user_type == "professional":
+        chats = Chat.query.filter_by(professional_id=user_id).order_by(Chat.last_message_at.desc()).all()
+    else:
+        return jsonify({"status": "error", "message": "user_type deve ser 'client' ou 'professional'."}), 400
+    
+    result = []
+    for chat in chats:
+        # order_by(None) descarta a ordenação ascendente padrão do relacionamento
+        last_message = chat.messages.order_by(None).order_by(Message.sent_at.desc()).first()
+        # Mensagens lidas podem ter sido arquivadas: só descomprime se houver segmento mais novo
+        newer_segments = chat.archived_segments.order_by(None).filter(
+            MessageArchive.last_sent_at > (last_message.sent_at if last_message else datetime.min)
+        ).order_by(MessageArchive.last_sent_at.desc()).limit(1)
+        last_message = latest_archived(newer_segments) or last_message
+        unread_count = chat.messages.filter_by(is_read=False).filter(Message.sender_id != user_id).count()
+        
+        result.append(serialize_chat(chat, chat.professional, last_message, unread_count))
+    
+    return jsonify({"status": "success", "chats": result})
+
+@chat_bp.route("/api/chats/<int:chat_id>/messages", methods=["GET"])
+def get_messages(chat_id):
+    """
+    Retorna as mensagens de um chat específico, incluindo as arquivadas.
+    Paginação opcional: `limit` mensagens mais recentes com id menor que `before_id`.
+    """
+    before_id = request.args.get("before_id", type=int)
+    try:
+        limit = page_limit(request.args.get("limit"))
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+    
+    chat = Chat.query.get(chat_id)
+    
+    if not chat:
+        return jsonify({"status": "error", "message": "Chat não encontrado."}), 404
+    
+    query = chat.messages
+    if before_id is not None:
+        query = query.filter(Message.id < before_id)
+    if limit is not None:
+        query = query.order_by(None).order_by(Message.id.desc()).limit(limit)
+    messages = query.all()
+    
+    if limit is not None:
+        messages.reverse()
+    
+    segments = chat.archived_segments
+    floor = archive_floor(messages, limit)
+    if floor is not None:
+        segments = segments.filter(MessageArchive.last_message_id > floor)
+    
+    result = [serialize_message(msg) for msg in message_page(messages, segments, before_id, limit)]
+    
+    return jsonify({"status": "success", "messages": result})
+
+@chat_bp.route("/api/chats/<int:chat_id>/messages/poll", methods=["GET"])
+def poll_messages(chat_id):
+    """Long-poll: aguarda até `wait` segundos por mensagens com id maior que `after_id`"""
+    after_id = request.args.get("after_id", default=0, type=int)
+    try:
+        wait = poll_wait(request.args.get("wait"))
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+    
+    if not db.session.get(Chat, chat_id):
+        return jsonify({"status": "error", "message": "Chat não encontrado."}), 404
+    
+    deadline = time.monotonic() + wait
+    while True:
+        messages = Message.query.filter(Message.chat_id == chat_id, Message.id > after_id).order_by(Message.sent_at).all()
+        if messages or time.monotonic() >= deadline:
+            break
+        # Encerra a transação para enxergar inserts de outras conexões na próxima leitura
+        db.session.rollback()
+        time.sleep(min(LONG_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+    
+    return jsonify({"status": "success", "messages": [serialize_message(msg) for msg in messages]})
+
+@chat_bp.route("/api/chats", methods=["POST"])
+@write_limited(body="client_id")
+def create_or_get_chat():
+    """Cria um novo chat ou retorna um existente entre cliente e profissional"""
+    data = request.get_json()
+    client_id = data.get("client_id")
+    professional_id = data.get("professional_id")
+    client_latitude = data.get("client_latitude")
+    client_longitude = data.get("client_longitude")
+    client_address = data.get("client_address")
+    
+    if not client_id or not professional_id:
+        return jsonify({"status": "error", "message": "client_id e professional_id são obrigatórios."}), 400
+    
+    # Um único INSERT ... ON CONFLICT: sem SELECT prévio e sem chats duplicados em toques simultâneos
+    now = datetime.utcnow()
+    chat_id, created_at = db.session.execute(chat_upsert(
+        db.engine.dialect.name, client_id, professional_id, now,
+        client_latitude, client_longitude, client_address
+    )).one()
+    db.session.commit()
+    
+    if created_at != now:
+        return jsonify({"status": "success", "chat_id": chat_id, "created": False})
+    
+    return jsonify({"status": "success", "chat_id": chat_id, "created": True}), 201
+
+@chat_bp.route("/api/chats/<int:chat_id>/messages", methods=["POST"])
+@write_limited(body="sender_id")
+def send_message(chat_id):
+    """Envia uma nova mensagem em um chat"""
+    chat = Chat.query.get(chat_id)
+    
+    if not chat:
+        return jsonify({"status": "error", "message": "Chat não encontrado."}), 404
+    
+    data = request.get_json()
+    sender_id = data.get("sender_id")
+    sender_type = data.get("sender_type")  # 'client' ou 'professional'
+    content = data.get("content")
+    
+    if not sender_id or not sender_type or not content:
+        return jsonify({"status": "error", "message": "sender_id, sender_type e content são obrigatórios."}), 400
+    
+    if sender_type not in ["client", "professional"]:
+        return jsonify({"status": "error", "message": "sender_type deve ser 'client' ou 'professional'."}), 400
+    
+    # Reenvios (rede móvel instável) com a mesma chave retornam a mensagem original
+    try:
+        key = idempotency_key(data.get("idempotency_key"), request.headers.get("Idempotency-Key"))
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+    
+    now = datetime.utcnow()
+    new_message = db.session.execute(message_insert(
+        db.engine.dialect.name, chat_id, sender_id, sender_type, content, now, key
+    )).one()
+    created = new_message.sent_at == now
+    
+    if created:
+        # Atualiza o timestamp do último mensagem no chat
+        chat.last_message_at = now
+    
+    db.session.commit()
+    
+    return jsonify({"status": "success", "message": serialize_message(new_message)}), 201 if created else 200
+
+@chat_bp.route("/api/chats/<int:chat_id>/messages/<int:message_id>/read", methods=["PUT"])
+def mark_message_as_read(chat_id, message_id):
+    """Marca uma mensagem como lida"""
+    message = Message.query.filter_by(id=message_id, chat_id=chat_id).first()
+    
+    if not message:
+        return jsonify({"status": "error", "message": "Mensagem não encontrada."}), 404
+    
+    message.is_read = True
+    db.session.commit()
+    
+    return jsonify({"status": "success", "message": "Mensagem marcada como lida."})
+
+@chat_bp.route("/api/chats/<int:chat_id>/messages/read-all", methods=["PUT"])
+def mark_all_messages_as_read(chat_id):
+    """Marca todas as mensagens de um chat como lidas para um usuário específico"""
+    data = request.get_json()
+    user_id = data.get("user_id")
+    
+    if not user_id:
+        return jsonify({"status": "error", "message": "user_id é obrigatório."}), 400
+    
+    chat = Chat.query.get(chat_id)
+    if not chat:
+        return jsonify({"status": "error", "message": "Chat não encontrado."}), 404
+    
+    # Marca como lidas todas as mensagens que não foram enviadas pelo usuário
+    messages = chat.messages.filter(Message.sender_id != user_id, Message.is_read == False).all()
+    
+    for msg in messages:
+        msg.is_read = True
+    
+    db.session.commit()
+    
+    return jsonify({"status": "success", "message": f"{len(messages)} mensagens marcadas como lidas."})
@@ -0,0 +1,124 @@
+"""
+Endpoints do dashboard e das métricas dos profissionais.
+"""
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from models import db, Professional, Subscription, Schedule, Chat, ProfessionalMetrics
+from cache import professional_cache
+from ratelimit import write_limited
+from helpers import (
+    VALID_METRICS, batch_ids, cached_profiles, cache_profiles, batch_result,
+    conversion_rate, serialize_metrics, serialize_dashboard
+)
+
+dashboard_bp = Blueprint("dashboard", __name__)
+
+@dashboard_bp.route("/api/professionals:batch", methods=["GET", "POST"])
+def get_professionals_batch():
+    """
+    Retorna perfil, plano e métricas de vários profissionais em uma única chamada.
+    GET: ?ids=prof_123,prof_789   POST: {"ids": ["prof_123", "prof_789"]}
+    """
+    try:
+        ids = batch_ids(request.method, request.get_json(silent=True), request.args.get("ids"))
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+    
+    # Perfis recentes saem do cache; os demais são lidos com um IN (...) por tabela
+    profiles, missing = cached_profiles(ids)
+    
+    if missing:
+        professionals = Professional.query.filter(Professional.id.in_(missing)).all()
+        subscriptions = {s.professional_id: s for s in Subscription.query.filter(Subscription.professional_id.in_(missing))}
+        metrics = {m.professional_id: m for m in ProfessionalMetrics.query.filter(ProfessionalMetrics.professional_id.in_(missing))}
+        cache_profiles(profiles, professionals, subscriptions, metrics)
+    
+    return jsonify(batch_result(ids, profiles))
+
+@dashboard_bp.route("/api/professionals/<string:professional_id>/metrics", methods=["GET"])
+def get_professional_metrics(professional_id):
+    """Retorna as métricas de desempenho de um profissional"""
+    professional = Professional.query.get(professional_id)
+    
+    if not professional:
+        return jsonify({"status": "error", "message": "Profissional não encontrado."}), 404
+    
+    metrics = ProfessionalMetrics.query.filter_by(professional_id=professional_id).first()
+    
+    if not metrics:
+        # Criar métricas padrão se não existirem
+        metrics = ProfessionalMetrics(professional_id=professional_id)
+        db.session.add(metrics)
+        db.session.commit()
+        professional_cache.invalidate(professional_id)
+    
+    # Calcular taxa de conversão
+    if metrics.profile_views > 0:
+        metrics.conversion_rate = conversion_rate(metrics)
+    
+    metrics_data = serialize_metrics(metrics, metrics.conversion_rate)
+    metrics_data["last_updated"] = metrics.last_updated.isoformat()
+    
+    return jsonify({"status": "success", "metrics": metrics_data})
+
+@dashboard_bp.route("/api/professionals/<string:professional_id>/dashboard", methods=["GET"])
+def get_professional_dashboard(professional_id):
+    """Retorna dados completos do dashboard do profissional"""
+    professional = Professional.query.get(professional_id)
+    
+    if not professional:
+        return jsonify({"status": "error", "message": "Profissional não encontrado."}), 404
+    
+    # Buscar métricas
+    metrics = ProfessionalMetrics.query.filter_by(professional_id=professional_id).first()
+    if not metrics:
+        metrics = ProfessionalMetrics(professional_id=professional_id)
+        db.session.add(metrics)
+        db.session.commit()
+        professional_cache.invalidate(professional_id)
+    
+    # Buscar assinatura
+    subscription = Subscription.query.filter_by(professional_id=professional_id).first()
+    
+    # Buscar chats ativos
+    active_chats = Chat.query.filter_by(professional_id=professional_id).count()
+    
+    # Buscar agendamentos futuros
+    upcoming_schedules = Schedule.query.filter(
+        Schedule.professional_id == professional_id,
+        Schedule.start_time > datetime.utcnow(),
+        Schedule.status == 'BLOCKED'
+    ).order_by(Schedule.start_time).limit(5).all()
+    
+    return jsonify({
+        "status": "success",
+        "dashboard": serialize_dashboard(professional, subscription, metrics, active_chats, upcoming_schedules)
+    })
+
+@dashboard_bp.route("/api/professionals/<string:professional_id>/metrics/increment", methods=["POST"])
+@write_limited(path="professional_id")
+def increment_metric(professional_id):
+    """Incrementa uma métrica específica do profissional"""
+    data = request.get_json()
+    metric_name = data.get("metric")
+    
+    if not metric_name:
+        return jsonify({"status": "error", "message": "O campo 'metric' é obrigatório."}), 400
+    
+    metrics = ProfessionalMetrics.query.filter_by(professional_id=professional_id).first()
+    
+    if not metrics:
+        metrics = ProfessionalMetrics(professional_id=professional_id)
+        db.session.add(metrics)
+    
+    # Incrementar a métrica especificada
+    if metric_name not in VALID_METRICS:
+        return jsonify({"status": "error", "message": f"Métrica '{metric_name}' inválida."}), 400
+    
+    current_value = getattr(metrics, metric_name)
+    setattr(metrics, metric_name, current_value + 1)
+    
+    db.session.commit()
+    professional_cache.invalidate(professional_id)
+    
+    return jsonify({"status": "success", "message": f"Métrica '{metric_name}' incrementada com sucesso."})
@@ -0,0 +1,30 @@
+"""
+Endpoints de exportação em streaming para análise.
+"""
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from models import db
+from export import DATASETS, FORMATS, parse_since, export_chunks
+
+export_bp = Blueprint("export", __name__)
+
+@export_bp.route("/api/export/<string:dataset>", methods=["GET"])
+def export_dataset(dataset):
+    """
+    Exporta métricas, mensagens ou agendamentos em NDJSON ou CSV, sem carregar tudo em memória.
+    Exportação incremental com `since` (data ISO 8601 ou id, conforme o dataset).
+    """
+    fmt = request.args.get("format", "ndjson")
+    
+    if dataset not in DATASETS:
+        return jsonify({"status": "error", "message": f"Dataset '{dataset}' inválido."}), 404
+    
+    if fmt not in FORMATS:
+        return jsonify({"status": "error", "message": "format deve ser 'ndjson' ou 'csv'."}), 400
+    
+    try:
+        since = parse_since(dataset, request.args.get("since"))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Parâmetro 'since' inválido para este dataset."}), 400
+    
+    # stream_with_context mantém a sessão do banco aberta enquanto os blocos são enviados
+    return Response(stream_with_context(export_chunks(db.session, dataset, fmt, since)), mimetype=FORMATS[fmt])
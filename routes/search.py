@@ -0,0 +1,84 @@
+"""
+Endpoints de busca e despacho de profissionais.
+"""
+from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify
+from models import db, Professional, Subscription, Chat
+from dispatch import dispatch_index, BLOCK_DURATION
+from helpers import rank_search_results, serialize_search_result
+
+search_bp = Blueprint("search", __name__)
+
+# Limite de profissionais retornados pelo despacho
+MAX_DISPATCH_RESULTS = 50
+
+@search_bp.route("/api/search/professionals", methods=["GET"])
+def search_professionals():
+    profession_query = request.args.get("profession")
+    city_query = request.args.get("city")
+    state_query = request.args.get("state")
+    user_latitude = request.args.get("latitude", type=float)
+    user_longitude = request.args.get("longitude", type=float)
+
+    if not profession_query:
+        return jsonify({"status": "error", "message": "O parâmetro 'profession' é obrigatório."}), 400
+
+    query = db.session.query(Professional, Subscription.plan).join(Subscription, Professional.id == Subscription.professional_id)
+    query = query.filter(Professional.profession.ilike(f"%{profession_query}%"))
+
+    if city_query:
+        query = query.filter(Professional.city.ilike(f"%{city_query}%"))
+    if state_query:
+        query = query.filter(Professional.state.ilike(f"%{state_query}%"))
+
+    if user_latitude is not None and user_longitude is not None:
+        query = query.filter(Professional.latitude.isnot(None), Professional.longitude.isnot(None))
+
+    professionals_with_subscription = query.all()
+
+    results = [serialize_search_result(professional, plan) for professional, plan in professionals_with_subscription]
+    rank_search_results(results, user_latitude, user_longitude)
+
+    return jsonify({"status": "success", "results": results})
+
+@search_bp.route("/api/dispatch/professionals", methods=["GET"])
+def dispatch_professionals():
+    """
+    Retorna os k profissionais mais próximos do cliente com assinatura ativa e agenda livre (RF 2.10).
+    A localização vem de `latitude`/`longitude` ou do endereço salvo no chat (`chat_id`).
+    """
+    profession_query = request.args.get("profession")
+    chat_id = request.args.get("chat_id", type=int)
+    client_latitude = request.args.get("latitude", type=float)
+    client_longitude = request.args.get("longitude", type=float)
+    k = request.args.get("k", default=5, type=int)
+    start_time = request.args.get("start_time")
+    
+    if not profession_query:
+        return jsonify({"status": "error", "message": "O parâmetro 'profession' é obrigatório."}), 400
+    
+    if chat_id is not None:
+        chat = Chat.query.get(chat_id)
+        if not chat:
+            return jsonify({"status": "error", "message": "Chat não encontrado."}), 404
+        client_latitude, client_longitude = chat.client_latitude, chat.client_longitude
+    
+    if client_latitude is None or client_longitude is None:
+        return jsonify({"status": "error", "message": "Informe latitude e longitude ou um chat_id com localização do cliente."}), 400
+    
+    if k < 1 or k > MAX_DISPATCH_RESULTS:
+        return jsonify({"status": "error", "message": f"O parâmetro 'k' deve estar entre 1 e {MAX_DISPATCH_RESULTS}."}), 400
+    
+    try:
+        start_time = datetime.fromisoformat(start_time) if start_time else datetime.utcnow()
+    except ValueError:
+        return jsonify({"status": "error", "message": "start_time deve estar no formato ISO 8601."}), 400
+    
+    if start_time.tzinfo is not None:
+        # Os horários da agenda são gravados em UTC sem fuso
+        start_time = start_time.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    dispatch_index.refresh(db.session)
+    results = dispatch_index.nearest(profession_query, client_latitude, client_longitude, k, start_time, start_time + BLOCK_DURATION)
+    
+    return jsonify({"status": "success", "results": results})
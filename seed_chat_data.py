@@ -1,13 +1,16 @@
 """
 Script para popular o banco de dados com dados de teste de chat
 """
-from app import app
-from models import db, Chat, Message
+from app import create_db_app
+from models import db, Chat, Message, MessageArchive
 from datetime import datetime, timedelta
 
 def seed_chat_data():
+    app = create_db_app()
     with app.app_context():
-        # Limpar dados de chat existentes
+        # Limpar dados de chat existentes; os segmentos arquivados também, senão ficariam
+        # órfãos e seriam lidos como histórico de um chat novo que reutilize o mesmo id
+        MessageArchive.query.delete()
         Message.query.delete()
         Chat.query.delete()
         db.session.commit()
@@ -1,11 +1,12 @@
 """
 Script para popular o banco de dados com métricas de teste para os profissionais
 """
-from app import app
+from app import create_db_app
 from models import db, ProfessionalMetrics
 from datetime import datetime
 
 def seed_metrics_data():
+    app = create_db_app()
     with app.app_context():
         # Limpar métricas existentes
         ProfessionalMetrics.query.delete()
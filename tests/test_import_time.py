@@ -0,0 +1,14 @@
+"""Orçamentos de cold start de check_import_time.py"""
+import pytest
+
+from check_import_time import BUDGETS, check, measure
+
+@pytest.fixture(scope="module")
+def baseline_modules():
+    return measure("pass")[1]
+
+@pytest.mark.parametrize("code, budget_ms, forbidden", BUDGETS, ids=[code for code, _, _ in BUDGETS])
+def test_import_budget(code, budget_ms, forbidden, baseline_modules):
+    elapsed_ms, loaded = check(code, forbidden, baseline_modules)
+    assert not loaded, f"módulos pesados importados: {', '.join(loaded)}"
+    assert elapsed_ms <= budget_ms, f"{elapsed_ms:.1f} ms (orçamento {budget_ms} ms)"